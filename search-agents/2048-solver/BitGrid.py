@@ -0,0 +1,261 @@
+from Grid import vecIndex, UP, DOWN, LEFT, RIGHT
+
+# The Board is a 64 Bit Int, 4 Bits per Cell Holding the Exponent of its
+# Tile (0 for an Empty Cell, k for 2^k). Cell (x, y) is at Bits
+# [16x + 4y, 16x + 4y + 4), so Each Row is 16 Bits with its Leftmost Cell
+# in the Lowest Bits. The Biggest Tile it Can Hold is 2^15
+SIZE = 4
+ROW_MASK = 0xFFFF
+CELL_MASK = 0xF
+MAX_EXPONENT = 15
+
+# Build the Result of Moving Every Possible Row, and the Score Made by Its
+# Merges. Rows Where Two 2^15 Tiles Merge Can't be Held, so They're Kept
+# Apart as Unsupported: Their Table Entries Cap the Tile at 2^15, Which is
+# Only Good Enough for Looking Ahead, and BitGrid.move Refuses Them
+def buildRowTables():
+    left = [0] * 65536
+    right = [0] * 65536
+    leftScore = [0] * 65536
+    rightScore = [0] * 65536
+    leftOverflow = set()
+    rightOverflow = set()
+
+    for row in range(65536):
+        cells = [(row >> (4 * i)) & CELL_MASK for i in range(SIZE)]
+
+        for reverse in (False, True):
+            tiles = [c for c in (cells[::-1] if reverse else cells) if c]
+            merged = []
+            score = 0
+            overflow = False
+            i = 0
+
+            # Same Rule as Grid.merge: a Merged Tile Doesn't Merge Again
+            while i < len(tiles):
+                if i + 1 < len(tiles) and tiles[i] == tiles[i + 1]:
+                    overflow = overflow or tiles[i] == MAX_EXPONENT
+                    exponent = min(tiles[i] + 1, MAX_EXPONENT)
+                    merged.append(exponent)
+                    score += 1 << exponent
+                    i += 2
+                else:
+                    merged.append(tiles[i])
+                    i += 1
+
+            merged += [0] * (SIZE - len(merged))
+
+            if reverse:
+                merged.reverse()
+
+            result = 0
+
+            for i in range(SIZE):
+                result |= merged[i] << (4 * i)
+
+            if reverse:
+                right[row] = result
+                rightScore[row] = score
+                if overflow:
+                    rightOverflow.add(row)
+            else:
+                left[row] = result
+                leftScore[row] = score
+                if overflow:
+                    leftOverflow.add(row)
+
+    return left, right, leftScore, rightScore, frozenset(leftOverflow), frozenset(rightOverflow)
+
+(ROW_LEFT, ROW_RIGHT, ROW_LEFT_SCORE, ROW_RIGHT_SCORE,
+ ROW_LEFT_OVERFLOW, ROW_RIGHT_OVERFLOW) = buildRowTables()
+
+# Spread a Row's Cells Down a Column: Cell i Goes to Bit 16i
+def rowToColumn(row):
+    return ((row & 0xF) | ((row & 0xF0) << 12) | ((row & 0xF00) << 24) |
+            ((row & 0xF000) << 36))
+
+# The Same Results as Columns, so Up and Down Only Need to Transpose Once
+COL_UP = [rowToColumn(row) for row in ROW_LEFT]
+COL_DOWN = [rowToColumn(row) for row in ROW_RIGHT]
+
+# Swap Rows and Columns: Cell (x, y) Goes to (y, x)
+def transpose(board):
+    a1 = board & 0xF0F00F0FF0F00F0F
+    a2 = board & 0x0000F0F00000F0F0
+    a3 = board & 0x0F0F00000F0F0000
+    a = a1 | (a2 << 12) | (a3 >> 12)
+    b1 = a & 0xFF00FF0000FF00FF
+    b2 = a & 0x00FF00FF00000000
+    b3 = a & 0x00000000FF00FF00
+
+    return b1 | (b2 >> 24) | (b3 << 24)
+
+# Apply a Row Table to All Four Rows of a Board
+def moveRows(board, table, scores):
+    r0 = board & ROW_MASK
+    r1 = (board >> 16) & ROW_MASK
+    r2 = (board >> 32) & ROW_MASK
+    r3 = (board >> 48) & ROW_MASK
+    result = table[r0] | (table[r1] << 16) | (table[r2] << 32) | (table[r3] << 48)
+
+    return result, scores[r0] + scores[r1] + scores[r2] + scores[r3]
+
+# Apply a Column Table to the Rows of a Transposed Board, Which are the
+# Columns of the Board
+def moveColumns(board, table, scores):
+    board = transpose(board)
+    c0 = board & ROW_MASK
+    c1 = (board >> 16) & ROW_MASK
+    c2 = (board >> 32) & ROW_MASK
+    c3 = (board >> 48) & ROW_MASK
+    result = table[c0] | (table[c1] << 4) | (table[c2] << 8) | (table[c3] << 12)
+
+    return result, scores[c0] + scores[c1] + scores[c2] + scores[c3]
+
+# The Board After a Move, and the Score Made By It. Up and Down are Left
+# and Right on the Columns
+def moveBoard(board, dir):
+    if dir == LEFT:
+        return moveRows(board, ROW_LEFT, ROW_LEFT_SCORE)
+    if dir == RIGHT:
+        return moveRows(board, ROW_RIGHT, ROW_RIGHT_SCORE)
+    if dir == UP:
+        return moveColumns(board, COL_UP, ROW_LEFT_SCORE)
+    if dir == DOWN:
+        return moveColumns(board, COL_DOWN, ROW_RIGHT_SCORE)
+
+    raise ValueError("Not a Move: %r" % (dir,))
+
+# Whether a Move Would Merge Two 2^15 Tiles, Which the Board Can't Hold
+def overflows(board, dir):
+    if dir == LEFT or dir == RIGHT:
+        rows = ROW_LEFT_OVERFLOW if dir == LEFT else ROW_RIGHT_OVERFLOW
+    else:
+        board = transpose(board)
+        rows = ROW_LEFT_OVERFLOW if dir == UP else ROW_RIGHT_OVERFLOW
+
+    return any((board >> shift) & ROW_MASK in rows for shift in (0, 16, 32, 48))
+
+# The Bit Offsets of the Empty Cells of a Board
+def emptyShifts(board):
+    return [shift for shift in range(0, 64, 4) if not (board >> shift) & CELL_MASK]
+
+class BitGrid:
+    def __init__(self, size = 4):
+        if size != SIZE:
+            raise ValueError("BitGrid Only Supports 4x4 Boards")
+
+        self.size = size
+        self.board = 0
+        self.score = 0
+
+    # Build a BitGrid Holding the Same Tiles as a Grid
+    @classmethod
+    def fromGrid(cls, grid):
+        bitGrid = cls(grid.size)
+
+        for x in range(grid.size):
+            for y in range(grid.size):
+                bitGrid.setCellValue((x, y), grid.map[x][y])
+
+        return bitGrid
+
+    # The Board is an Int, so a Copy is Just Another Reference to It
+    def clone(self):
+        gridCopy = BitGrid.__new__(BitGrid)
+        gridCopy.size = self.size
+        gridCopy.board = self.board
+        gridCopy.score = self.score
+
+        return gridCopy
+
+    # The Tiles as a List of Lists of Values, as in Grid (Used by Displayer)
+    @property
+    def map(self):
+        return [[self.getCellValue((x, y)) for y in range(self.size)]
+                for x in range(self.size)]
+
+    # Insert a Tile in an Empty Cell
+    def insertTile(self, pos, value):
+        self.setCellValue(pos, value)
+
+    def setCellValue(self, pos, value):
+        shift = 16 * pos[0] + 4 * pos[1]
+        exponent = value.bit_length() - 1 if value else 0
+
+        if exponent > MAX_EXPONENT:
+            raise ValueError("BitGrid Tiles Only Go Up to %d" % (1 << MAX_EXPONENT))
+
+        self.board = (self.board & ~(CELL_MASK << shift)) | (exponent << shift)
+
+    # Return All the Empty Cells
+    def getAvailableCells(self):
+        return [(shift >> 4, (shift >> 2) & 3) for shift in emptyShifts(self.board)]
+
+    # Return the Tile with Maximum Value
+    def getMaxTile(self):
+        board = self.board
+        exponent = 0
+
+        while board:
+            exponent = max(exponent, board & CELL_MASK)
+            board >>= 4
+
+        return 1 << exponent if exponent else 0
+
+    # Check If Able to Insert a Tile in Position
+    def canInsert(self, pos):
+        return self.getCellValue(pos) == 0
+
+    # Move the Grid. A Merge Past the Biggest Tile Raises, as in setCellValue
+    def move(self, dir):
+        dir = int(dir)
+
+        if overflows(self.board, dir):
+            raise ValueError("BitGrid Tiles Only Go Up to %d" % (1 << MAX_EXPONENT))
+
+        board, score = moveBoard(self.board, dir)
+        moved = board != self.board
+        self.board = board
+        self.score += score
+
+        return moved
+
+    # Unlike Grid.canMove, Only True if One of dirs Actually Changes the Board
+    def canMove(self, dirs = vecIndex):
+        for dir in dirs:
+            if moveBoard(self.board, dir)[0] != self.board:
+                return True
+
+        return False
+
+    # Return All Available Moves
+    def getAvailableMoves(self, dirs = vecIndex):
+        return [dir for dir in dirs if moveBoard(self.board, dir)[0] != self.board]
+
+    def crossBound(self, pos):
+        return pos[0] < 0 or pos[0] >= self.size or pos[1] < 0 or pos[1] >= self.size
+
+    def getCellValue(self, pos):
+        if not self.crossBound(pos):
+            exponent = (self.board >> (16 * pos[0] + 4 * pos[1])) & CELL_MASK
+
+            return 1 << exponent if exponent else 0
+        else:
+            return None
+
+if __name__ == '__main__':
+    g = BitGrid()
+    g.setCellValue((0, 0), 2)
+    g.setCellValue((1, 0), 2)
+    g.setCellValue((3, 0), 4)
+
+    while True:
+        for i in g.map:
+            print(i)
+
+        print(g.getAvailableMoves())
+
+        v = input()
+
+        g.move(v)
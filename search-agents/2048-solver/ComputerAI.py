@@ -1,8 +1,12 @@
-from random import randint
+from random import Random
 from BaseAI import BaseAI
 
 class ComputerAI(BaseAI):
+    # Seed the Cell Choices to Replay a Game
+    def __init__(self, seed = None):
+        self.random = Random(seed)
+
     def getMove(self, grid):
         cells = grid.getAvailableCells()
 
-        return cells[randint(0, len(cells) - 1)] if cells else None
+        return cells[self.random.randint(0, len(cells) - 1)] if cells else None
@@ -1,8 +1,10 @@
 from Grid       import Grid
+from BitGrid    import BitGrid
 from ComputerAI import ComputerAI
 from PlayerAI   import PlayerAI
 from Displayer  import Displayer
-from random       import randint
+from random       import Random
+import argparse
 import time
 
 defaultInitialTiles = 2
@@ -21,9 +23,23 @@ actionDic = {
 timeLimit = 0.2
 allowance = 0.05
 
+# Split a Game's Seed Into Seeds for the New Tiles' Values and Their Cells, so
+# the Two Don't Draw the Same Numbers
+def gameSeeds(seed):
+    if seed is None:
+        return None, None
+
+    random = Random(seed)
+
+    return random.getrandbits(64), random.getrandbits(64)
+
 class GameManager:
-    def __init__(self, size = 4):
-        self.grid = Grid(size)
+    # A Headless Game Neither Displays nor Prints Anything and Never Waits
+    # Out the Time Limit, Only Checks It. seed Makes the New Tiles Repeatable
+    def __init__(self, size = 4, headless = False, seed = None, gridClass = Grid):
+        self.grid = gridClass(size)
+        self.headless = headless
+        self.random = Random(seed)
         self.possibleNewTiles = [2, 4]
         self.probability = defaultProbability
         self.initTiles  = defaultInitialTiles
@@ -31,6 +47,7 @@ class GameManager:
         self.playerAI   = None
         self.displayer  = None
         self.over       = False
+        self.timedOut   = False
 
     def setComputerAI(self, computerAI):
         self.computerAI = computerAI
@@ -44,23 +61,38 @@ class GameManager:
     def updateAlarm(self, currTime):
         if currTime - self.prevTime > timeLimit + allowance:
             self.over = True
+            self.timedOut = True
+        elif self.headless:
+            self.prevTime = currTime
         else:
-            while time.clock() - self.prevTime < timeLimit + allowance:
+            while time.perf_counter() - self.prevTime < timeLimit + allowance:
                 pass
 
-            self.prevTime = time.clock()
+            self.prevTime = time.perf_counter()
 
+    def log(self, *args, **kwargs):
+        if not self.headless:
+            print(*args, **kwargs)
+
+    def display(self):
+        if not self.headless:
+            self.displayer.display(self.grid)
+
+    # Play a Game Out and Return Its Max Tile, Score, Number of Player Moves
+    # and the Seconds Each Player Move Took
     def start(self):
         for i in range(self.initTiles):
             self.insertRandonTile()
 
-        self.displayer.display(self.grid)
+        self.display()
 
         # Player AI Goes First
         turn = PLAYER_TURN
         maxTile = 0
+        moves = 0
+        latencies = []
 
-        self.prevTime = time.clock()
+        self.prevTime = time.perf_counter()
 
         while not self.isGameOver() and not self.over:
             # Copy to Ensure AI Cannot Change the Real Grid to Cheat
@@ -69,48 +101,59 @@ class GameManager:
             move = None
 
             if turn == PLAYER_TURN:
-                print("Player's Turn:", end="")
+                self.log("Player's Turn:", end="")
+                moveStart = time.perf_counter()
                 move = self.playerAI.getMove(gridCopy)
-                print(actionDic[move])
+                latencies.append(time.perf_counter() - moveStart)
+                self.log(actionDic.get(move))
 
                 # Validate Move
                 if move != None and move >= 0 and move < 4:
                     if self.grid.canMove([move]):
                         self.grid.move(move)
+                        moves += 1
 
                         # Update maxTile
                         maxTile = self.grid.getMaxTile()
                     else:
-                        print("Invalid PlayerAI Move")
+                        self.log("Invalid PlayerAI Move")
                         self.over = True
                 else:
-                    print("Invalid PlayerAI Move - 1")
+                    self.log("Invalid PlayerAI Move - 1")
                     self.over = True
             else:
-                print("Computer's turn:")
+                self.log("Computer's turn:")
                 move = self.computerAI.getMove(gridCopy)
 
                 # Validate Move
                 if move and self.grid.canInsert(move):
                     self.grid.setCellValue(move, self.getNewTileValue())
                 else:
-                    print("Invalid Computer AI Move")
+                    self.log("Invalid Computer AI Move")
                     self.over = True
 
             if not self.over:
-                self.displayer.display(self.grid)
+                self.display()
 
             # Exceeding the Time Allotted for Any Turn Terminates the Game
-            self.updateAlarm(time.clock())
+            self.updateAlarm(time.perf_counter())
 
             turn = 1 - turn
-        print(maxTile)
+        self.log(maxTile)
+
+        return {
+            "maxTile": self.grid.getMaxTile(),
+            "score": self.grid.score,
+            "moves": moves,
+            "timedOut": self.timedOut,
+            "latencies": latencies
+        }
 
     def isGameOver(self):
         return not self.grid.canMove()
 
     def getNewTileValue(self):
-        if randint(0,99) < 100 * self.probability:
+        if self.random.randint(0,99) < 100 * self.probability:
             return self.possibleNewTiles[0]
         else:
             return self.possibleNewTiles[1]
@@ -118,20 +161,40 @@ class GameManager:
     def insertRandonTile(self):
         tileValue = self.getNewTileValue()
         cells = self.grid.getAvailableCells()
-        cell = cells[randint(0, len(cells) - 1)]
+        cell = cells[self.random.randint(0, len(cells) - 1)]
         self.grid.setCellValue(cell, tileValue)
 
 def main():
-    gameManager = GameManager()
+    parser = argparse.ArgumentParser(description="Plays a game of 2048")
+    parser.add_argument("--headless", action="store_true",
+                        help="play without displaying or waiting, then print the result")
+    parser.add_argument("--seed", type=int, default=None,
+                        help="seed for the new tiles, to replay a game")
+    arguments = parser.parse_args()
+
+    tileSeed, cellSeed = gameSeeds(arguments.seed)
+
+    gameManager = GameManager(headless = arguments.headless, seed = tileSeed,
+                              gridClass = BitGrid if arguments.headless else Grid)
     playerAI  	= PlayerAI()
-    computerAI  = ComputerAI()
+    computerAI  = ComputerAI(cellSeed)
     displayer 	= Displayer()
 
     gameManager.setDisplayer(displayer)
     gameManager.setPlayerAI(playerAI)
     gameManager.setComputerAI(computerAI)
 
-    gameManager.start()
+    result = gameManager.start()
+
+    if arguments.headless:
+        latencies = result["latencies"]
+
+        print("Max Tile: %d, Score: %d, Moves: %d, Timed Out: %s" %
+              (result["maxTile"], result["score"], result["moves"], result["timedOut"]))
+
+        if latencies:
+            print("Move Time: %.4fs Mean, %.4fs Max" %
+                  (sum(latencies) / len(latencies), max(latencies)))
 
 if __name__ == '__main__':
     main()
@@ -7,12 +7,14 @@ class Grid:
     def __init__(self, size = 4):
         self.size = size
         self.map = [[0] * self.size for i in range(self.size)]
+        self.score = 0
 
     # Make a Deep Copy of This Object
     def clone(self):
         gridCopy = Grid()
         gridCopy.map = deepcopy(self.map)
         gridCopy.size = self.size
+        gridCopy.score = self.score
 
         return gridCopy
 
@@ -115,7 +117,7 @@ class Grid:
 
         return moved
 
-    # Merge Tiles
+    # Merge Tiles, Adding Each Merged Tile to the Score
     def merge(self, cells):
         if len(cells) <= 1:
             return cells
@@ -125,6 +127,7 @@ class Grid:
         while i < len(cells) - 1:
             if cells[i] == cells[i+1]:
                 cells[i] *= 2
+                self.score += cells[i]
 
                 del cells[i+1]
 
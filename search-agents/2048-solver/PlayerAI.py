@@ -1,8 +1,207 @@
-from random import randint
 from BaseAI import BaseAI
+from BitGrid import BitGrid, ROW_MASK, CELL_MASK, moveBoard, emptyShifts, transpose
+from Grid import vecIndex
+import time
+
+# Stop Searching Well Inside GameManager's 0.2s timeLimit
+searchTime = 0.15
+maxDepth = 12
+
+# Chance Nodes Less Likely Than This are Scored Without Searching Further
+minProbability = 0.0001
+
+# Tiles the Computer Inserts, as in GameManager.getNewTileValue
+TILE_2_PROBABILITY = 0.9
+TILE_4_PROBABILITY = 0.1
+
+# Heuristic Weights: a Board Scores Higher for Empty Cells, Tiles Ready to
+# Merge, and Rows and Columns Running Monotonically, and Lower for Its Sum
+# of Tiles, so Small Tiles Left Around Cost More Than One Big Tile
+LOST_PENALTY = 200000.0
+EMPTY_WEIGHT = 270.0
+MERGES_WEIGHT = 700.0
+MONOTONICITY_POWER = 4.0
+MONOTONICITY_WEIGHT = 47.0
+SUM_POWER = 3.5
+SUM_WEIGHT = 11.0
+
+# Score Every Possible Row (and Column) Once, Like BitGrid's Move Tables
+def buildHeuristicTable():
+    table = [0.0] * 65536
+
+    for row in range(65536):
+        line = [(row >> (4 * i)) & CELL_MASK for i in range(4)]
+        tileSum = 0.0
+        empty = 0
+        merges = 0
+        prev = 0
+        counter = 0
+
+        for rank in line:
+            tileSum += rank ** SUM_POWER
+
+            if rank == 0:
+                empty += 1
+            else:
+                if prev == rank:
+                    counter += 1
+                elif counter > 0:
+                    merges += 1 + counter
+                    counter = 0
+
+                prev = rank
+
+        if counter > 0:
+            merges += 1 + counter
+
+        left = 0.0
+        right = 0.0
+
+        for i in range(1, 4):
+            if line[i - 1] > line[i]:
+                left += line[i - 1] ** MONOTONICITY_POWER - line[i] ** MONOTONICITY_POWER
+            else:
+                right += line[i] ** MONOTONICITY_POWER - line[i - 1] ** MONOTONICITY_POWER
+
+        table[row] = (LOST_PENALTY + EMPTY_WEIGHT * empty + MERGES_WEIGHT * merges -
+                      MONOTONICITY_WEIGHT * min(left, right) - SUM_WEIGHT * tileSum)
+
+    return table
+
+HEURISTIC = buildHeuristicTable()
+
+# Score a Board by Its Rows and Its Columns
+def evaluate(board):
+    columns = transpose(board)
+
+    return (HEURISTIC[board & ROW_MASK] + HEURISTIC[(board >> 16) & ROW_MASK] +
+            HEURISTIC[(board >> 32) & ROW_MASK] + HEURISTIC[(board >> 48) & ROW_MASK] +
+            HEURISTIC[columns & ROW_MASK] + HEURISTIC[(columns >> 16) & ROW_MASK] +
+            HEURISTIC[(columns >> 32) & ROW_MASK] + HEURISTIC[(columns >> 48) & ROW_MASK])
+
+# Raised Inside the Search When the Deadline Passes
+class SearchTimeout(Exception):
+    pass
 
 class PlayerAI(BaseAI):
+    def __init__(self, searchTime = searchTime, maxDepth = maxDepth,
+                 minProbability = minProbability):
+        self.searchTime = searchTime
+        self.maxDepth = maxDepth
+        self.minProbability = minProbability
+        self.lastDepth = 0
+
+    # Expectimax by Iterative Deepening: Search One Move Deeper at a Time and
+    # Keep the Move of the Deepest Search Finished Before the Deadline
     def getMove(self, grid):
-        moves = grid.getAvailableMoves()
-        return moves[randint(0, len(moves) - 1)] if moves else None
+        start = time.perf_counter()
+        self.deadline = start + self.searchTime
+        board = grid.board if isinstance(grid, BitGrid) else BitGrid.fromGrid(grid).board
+
+        moves = [dir for dir in vecIndex if moveBoard(board, dir)[0] != board]
+
+        if not moves:
+            return None
+
+        # Boards Already Scored, and the Depth They were Searched To
+        self.table = {}
+        bestMove = moves[0]
+        self.lastDepth = 0
+        depth = 1
+        previous = None
+
+        while depth <= self.maxDepth:
+            iterationStart = time.perf_counter()
+            self.cutoff = False
+
+            try:
+                bestMove = self.searchRoot(board, moves, depth)
+            except SearchTimeout:
+                break
+
+            self.lastDepth = depth
+            now = time.perf_counter()
+            elapsed = now - iterationStart
+
+            # Nothing Was Cut Off by the Depth, so Deeper Searches Would Agree
+            if not self.cutoff:
+                break
+
+            # Don't Start a Search That Can't Finish: Guess It Takes as Much
+            # Longer as the Last One Took Over the One Before
+            growth = elapsed / previous if previous else 4.0
+            previous = max(elapsed, 1e-6)
+
+            if now + elapsed * max(growth, 1.0) > self.deadline:
+                break
+
+            depth += 1
+
+        return bestMove
+
+    def searchRoot(self, board, moves, depth):
+        bestMove = moves[0]
+        bestValue = -1.0
+
+        for dir in moves:
+            value = self.chanceNode(moveBoard(board, dir)[0], depth, 1.0)
+
+            if value > bestValue:
+                bestMove = dir
+                bestValue = value
+
+        return bestMove
+
+    # The Player Picks the Move with the Best Expected Value
+    def maxNode(self, board, depth, probability):
+        bestValue = 0.0
+
+        for dir in vecIndex:
+            moved = moveBoard(board, dir)[0]
+
+            if moved != board:
+                value = self.chanceNode(moved, depth, probability)
+
+                if value > bestValue:
+                    bestValue = value
+
+        return bestValue
+
+    # The Computer Puts a 2 or a 4 in Any Empty Cell, All Equally Likely
+    def chanceNode(self, board, depth, probability):
+        if depth == 0:
+            self.cutoff = True
+
+            return evaluate(board)
+
+        if probability < self.minProbability:
+            return evaluate(board)
+
+        entry = self.table.get(board)
+
+        # A Stored Value May Itself Have Been Cut Off by the Depth
+        if entry is not None and entry[0] >= depth:
+            self.cutoff = True
+
+            return entry[1]
+
+        if time.perf_counter() > self.deadline:
+            raise SearchTimeout()
+
+        shifts = emptyShifts(board)
+        cellProbability = probability / len(shifts)
+        probability2 = cellProbability * TILE_2_PROBABILITY
+        probability4 = cellProbability * TILE_4_PROBABILITY
+        total = 0.0
+
+        for shift in shifts:
+            total += TILE_2_PROBABILITY * self.maxNode(board | (1 << shift), depth - 1, probability2)
+            total += TILE_4_PROBABILITY * self.maxNode(board | (2 << shift), depth - 1, probability4)
+
+        value = total / len(shifts)
+
+        # Keep Whichever Entry was Searched Deeper
+        if entry is None or entry[0] <= depth:
+            self.table[board] = (depth, value)
 
+        return value
@@ -0,0 +1,140 @@
+from GameManager import GameManager, gameSeeds, timeLimit
+from ComputerAI  import ComputerAI
+from PlayerAI    import PlayerAI
+from BitGrid     import BitGrid
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from collections import Counter
+import argparse
+import json
+import os
+
+winTiles = [2048, 4096, 8192]
+latencyPercentiles = [50, 90, 99]
+
+# Play One Headless Game. Everything Random in It Comes From Its Seed, so a
+# Game Replays the Same Whichever Worker Plays It
+def playGame(agent, config, seed):
+    tileSeed, cellSeed = gameSeeds(seed)
+
+    gameManager = GameManager(headless = True, seed = tileSeed, gridClass = BitGrid)
+    gameManager.setPlayerAI(PlayerAI(**config))
+    gameManager.setComputerAI(ComputerAI(cellSeed))
+
+    result = gameManager.start()
+    result["agent"] = agent
+    result["seed"] = seed
+
+    return result
+
+# Nearest Rank Percentile of Sorted Values
+def percentile(values, p):
+    if not values:
+        return 0.0
+
+    return values[min(len(values) - 1, max(0, -(-len(values) * p // 100) - 1))]
+
+def latencySummary(latencies):
+    latencies = sorted(latencies)
+    summary = {"p%d" % p: percentile(latencies, p) for p in latencyPercentiles}
+    summary["max"] = latencies[-1] if latencies else 0.0
+    summary["overLimit"] = sum(1 for latency in latencies if latency > timeLimit)
+
+    return summary
+
+# The Record Written for a Game: Its Result With the Latencies Summarized
+def gameRecord(result):
+    record = {key: value for key, value in result.items() if key != "latencies"}
+    record["latency"] = latencySummary(result["latencies"])
+
+    return record
+
+def summarize(results):
+    maxTiles = Counter(result["maxTile"] for result in results)
+    latencies = [latency for result in results for latency in result["latencies"]]
+    summary = {
+        "games": len(results),
+        "meanScore": sum(result["score"] for result in results) / len(results),
+        "maxTiles": {str(tile): maxTiles[tile] for tile in sorted(maxTiles)},
+        "winRates": {str(tile): sum(1 for result in results if result["maxTile"] >= tile) /
+                     len(results) for tile in winTiles},
+        "timedOut": sum(1 for result in results if result["timedOut"]),
+        "latency": latencySummary(latencies)
+    }
+
+    return summary
+
+# Play games Seeded Games, the Same Seeds for Every Agent, Across a Pool of
+# Worker Processes. Each Game's Record is Written to out as It Finishes.
+# Returns the Summary of Each Agent
+def runTournament(agents, games, out, workers = None, baseSeed = 0):
+    results = {agent: [] for agent in agents}
+
+    with ProcessPoolExecutor(max_workers = workers) as executor:
+        futures = [executor.submit(playGame, agent, config, baseSeed + i)
+                   for agent, config in agents.items() for i in range(games)]
+
+        for future in as_completed(futures):
+            result = future.result()
+            results[result["agent"]].append(result)
+
+            out.write(json.dumps(gameRecord(result)) + "\n")
+            out.flush()
+
+    return {agent: summarize(results[agent]) for agent in agents}
+
+# An Agent is NAME or NAME:key=value,key=value, the Values Being PlayerAI Arguments
+def parseAgent(text):
+    name, _, settings = text.partition(":")
+    config = {}
+
+    for setting in filter(None, settings.split(",")):
+        key, value = setting.split("=")
+        config[key] = float(value) if "." in value or "e" in value else int(value)
+
+    return name, config
+
+def printSummary(agent, summary):
+    latency = summary["latency"]
+
+    print("%s: %d Games, Mean Score %.1f" % (agent, summary["games"], summary["meanScore"]))
+    print("  Max Tiles: " + ", ".join("%s x%d" % (tile, count)
+                                      for tile, count in summary["maxTiles"].items()))
+    print("  Win Rates: " + ", ".join("%s %.1f%%" % (tile, 100 * rate)
+                                      for tile, rate in summary["winRates"].items()))
+    print("  Move Time: " + ", ".join("p%d %.4fs" % (p, latency["p%d" % p])
+                                      for p in latencyPercentiles) +
+          ", max %.4fs" % latency["max"])
+
+    # Flag Agents That Would Lose Games to the Time Limit in GameManager
+    if latency["overLimit"] or summary["timedOut"]:
+        print("  Over the %.2fs Time Limit: %d Moves, %d Games Timed Out" %
+              (timeLimit, latency["overLimit"], summary["timedOut"]))
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Plays seeded headless games of 2048 for each agent across processes")
+    parser.add_argument("--agent", action="append", type=parseAgent, default=None,
+                        metavar="NAME[:key=value,...]",
+                        help="a PlayerAI configuration, e.g. fast:searchTime=0.05; "
+                             "repeat for several")
+    parser.add_argument("--games", type=int, default=10,
+                        help="games per agent")
+    parser.add_argument("--seed", type=int, default=0,
+                        help="seed of the first game, the rest follow on from it")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(),
+                        help="number of worker processes")
+    parser.add_argument("--output", default="tournament.jsonl",
+                        help="file to write one JSON line per game to")
+    arguments = parser.parse_args()
+
+    agents = dict(arguments.agent or [("default", {})])
+
+    with open(arguments.output, "w") as out:
+        summaries = runTournament(agents, arguments.games, out, arguments.workers,
+                                  arguments.seed)
+
+    for agent, summary in summaries.items():
+        printSummary(agent, summary)
+
+if __name__ == '__main__':
+    main()
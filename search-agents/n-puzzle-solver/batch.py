@@ -0,0 +1,169 @@
+import os
+import sys
+import json
+import signal
+import logging
+import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from npuzzle import (ALGORITHMS, NPuzzleSolver, State, check_heuristic, parse_board,
+                     stats_record)
+
+# Per worker process: the heuristic handed to solvers and one solver per
+# algorithm, reused across boards through reset(), plus the solution cache
+worker_heuristic = None
+worker_solvers = {}
+worker_cache = None
+worker_max_states = None
+
+
+class BoardTimeout(Exception):
+    """
+    Raised inside a worker when a board runs past its time limit
+    """
+    pass
+
+
+def on_alarm(signum, frame):
+    raise BoardTimeout()
+
+
+def init_worker(pdb_path, cache_path=None, max_states=None):
+    """
+    Runs once in every worker process, loads the pattern database (if any)
+    so that it's mapped once per worker rather than once per board, and
+    connects to the solution cache (if any). max_states is the state budget
+    of the worker's solvers. Boards of another size than the pattern
+    database is for get an error record from solve_board
+    """
+    global worker_heuristic, worker_cache, worker_max_states
+    worker_max_states = max_states
+    if pdb_path is not None:
+        from patterndb import PatternDatabase
+        worker_heuristic = PatternDatabase(pdb_path)
+    if cache_path is not None:
+        from solutioncache import SolutionCache
+        worker_cache = SolutionCache(cache_path)
+    signal.signal(signal.SIGALRM, on_alarm)
+
+
+def solve_board(algo, board, timeout=None, time_budget=None):
+    """
+    Solves a single board (a comma separated string) in a worker and
+    returns its result record. A timeout, in seconds, is enforced with
+    an interval timer so the worker is free for the next board as soon
+    as it expires. time_budget is handed to solve(), for ara
+    """
+    record = {"board": board, "method": algo}
+    try:
+        tiles = parse_board(board)
+        if worker_heuristic is not None:
+            check_heuristic(worker_heuristic, tiles)
+        initial_state = State(tiles)
+        stats = None
+        if worker_cache is not None:
+            stats = worker_cache.lookup(algo, initial_state)
+        if stats is None:
+            solver = worker_solvers.get(algo)
+            if solver is None:
+                solver = NPuzzleSolver(algo, heuristic=worker_heuristic,
+                                       max_states=worker_max_states)
+                worker_solvers[algo] = solver
+            solver.reset(initial_state)
+            if timeout:
+                signal.setitimer(signal.ITIMER_REAL, timeout)
+            try:
+                stats = solver.solve(time_budget)
+            finally:
+                signal.setitimer(signal.ITIMER_REAL, 0)
+            if worker_cache is not None and stats is not None:
+                worker_cache.store(algo, initial_state, stats)
+    except BoardTimeout:
+        record["status"] = "timeout"
+        return record
+    except Exception as e:
+        record["status"] = "error"
+        record["error"] = str(e)
+        return record
+
+    if stats is None:
+        record["status"] = "error"
+        record["error"] = "out of the state budget"
+        return record
+    if not stats["solvable"]:
+        record["status"] = "unsolvable"
+        return record
+    record["status"] = "solved"
+    record.update(stats_record(stats))
+    return record
+
+
+def read_boards(source):
+    """
+    Yields the boards of a file, one per line. Blank lines and lines
+    starting with # are skipped
+    """
+    for line in source:
+        line = line.strip()
+        if line and not line.startswith("#"):
+            yield line
+
+
+def run_batch(algo, boards, out, workers=None, timeout=None, pdb_path=None,
+              cache_path=None, max_states=None, time_budget=None):
+    """
+    Fans boards out across a pool of worker processes and writes one JSON
+    line per board to out, in the order boards complete. Returns the number
+    of boards processed
+    """
+    count = 0
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_worker,
+                             initargs=(pdb_path, cache_path, max_states)) as executor:
+        futures = [executor.submit(solve_board, algo, board, timeout, time_budget)
+                   for board in boards]
+        for future in as_completed(futures):
+            out.write(json.dumps(future.result()) + "\n")
+            out.flush()
+            count = count + 1
+    return count
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO,
+                        format='%(asctime)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(
+        description="Solves a batch of n-puzzle boards across processes")
+    parser.add_argument("method", choices=ALGORITHMS)
+    parser.add_argument("boards", nargs="?", default="-",
+                        help="file with one comma separated board per line, "
+                             "- for stdin (default)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(),
+                        help="number of worker processes")
+    parser.add_argument("--timeout", type=float, default=None,
+                        help="time limit per board, in seconds")
+    parser.add_argument("--output", default="-",
+                        help="file to write JSON lines to, - for stdout (default)")
+    parser.add_argument("--pdb", default=None,
+                        help="pattern database file to use as the heuristic")
+    parser.add_argument("--cache", default=None, metavar="FILE",
+                        help="sqlite solution cache shared by the workers")
+    parser.add_argument("--max-states", type=int, default=None, metavar="N",
+                        help="most states a bfs/dfs/ast search may hold before "
+                             "falling back to a beam search")
+    parser.add_argument("--budget", type=float, default=None, metavar="SECONDS",
+                        help="how long ara may spend improving each first path")
+    arguments = parser.parse_args(sys.argv[1:])
+
+    source = sys.stdin if arguments.boards == "-" else open(arguments.boards)
+    out = sys.stdout if arguments.output == "-" else open(arguments.output, "w")
+    try:
+        boards = list(read_boards(source))
+        done = run_batch(arguments.method, boards, out, arguments.workers,
+                         arguments.timeout, arguments.pdb, arguments.cache,
+                         arguments.max_states, arguments.budget)
+        logging.info("Processed %d of %d boards", done, len(boards))
+    finally:
+        if source is not sys.stdin:
+            source.close()
+        if out is not sys.stdout:
+            out.close()
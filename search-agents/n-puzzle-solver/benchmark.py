@@ -0,0 +1,334 @@
+import os
+import sys
+import json
+import time
+import random
+import logging
+import argparse
+import resource
+import multiprocessing
+from queue import Empty
+
+from npuzzle import ALGORITHMS, NPuzzleSolver, State, is_solvable
+import batch
+
+# Bands of optimal solution depth the 8-puzzle corpus is stratified into;
+# 31 is the deepest any 8-puzzle board goes
+DEPTH_BANDS = [(0, 3), (4, 7), (8, 11), (12, 15), (16, 19), (20, 23), (24, 27), (28, 31)]
+
+# A run is only flagged as slower or bigger than its baseline when it's off
+# by more than the tolerance and by more than these absolute amounts, which
+# keeps the noise of very short runs out of the report
+MIN_TIME_DELTA = 0.05
+MIN_MEMORY_DELTA = 2048
+
+# Korf's 100 15-puzzle instances with their optimal depths, in the format
+# file_corpus reads, selected with --corpus korf100
+KORF100_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "korf100.txt")
+
+# Methods whose expansions depend on how their worker processes get
+# scheduled, so their node counts are only held to the tolerance
+NONDETERMINISTIC_METHODS = ("hda",)
+
+
+def random_walk(dimensions, steps, rng):
+    """
+    A board reached by a random walk of the blank from the goal, never
+    undoing the previous move. Always solvable, and no deeper than steps
+    """
+    tiles = list(range(dimensions * dimensions))
+    empty = 0
+    previous = None
+    for _ in range(steps):
+        options = []
+        if empty >= dimensions:
+            options.append(-dimensions)
+        if empty < dimensions * dimensions - dimensions:
+            options.append(dimensions)
+        if empty % dimensions != 0:
+            options.append(-1)
+        if empty % dimensions != dimensions - 1:
+            options.append(1)
+        if previous is not None and -previous in options:
+            options.remove(-previous)
+        offset = rng.choice(options)
+        tiles[empty], tiles[empty + offset] = tiles[empty + offset], tiles[empty]
+        empty = empty + offset
+        previous = offset
+    return tiles
+
+
+def eight_puzzle_corpus(per_band, seed):
+    """
+    A reproducible corpus of 8-puzzle boards, up to per_band boards for
+    every band of DEPTH_BANDS, along with their optimal depths (from A*).
+    Candidates are random walks of random length, which reach the shallow
+    bands, and random permutations, which reach the deep ones
+    """
+    rng = random.Random(seed)
+    bands = {band: [] for band in DEPTH_BANDS}
+    seen = set()
+    attempts = 0
+    while attempts < 200 * per_band * len(DEPTH_BANDS):
+        attempts = attempts + 1
+        if attempts % 2:
+            tiles = random_walk(3, rng.randint(0, 40), rng)
+        else:
+            tiles = list(range(9))
+            rng.shuffle(tiles)
+            if not is_solvable(tiles):
+                continue
+        if tuple(tiles) in seen:
+            continue
+        seen.add(tuple(tiles))
+        depth = NPuzzleSolver("ast", State(tiles)).solve()["cost_of_path"]
+        for band in DEPTH_BANDS:
+            if band[0] <= depth <= band[1] and len(bands[band]) < per_band:
+                bands[band].append({"board": tiles, "optimal_depth": depth})
+        if all(len(boards) == per_band for boards in bands.values()):
+            break
+    for band, boards in bands.items():
+        if len(boards) < per_band:
+            logging.warning("Only found %d boards of depth %d-%d",
+                            len(boards), band[0], band[1])
+    return [instance for band in DEPTH_BANDS for instance in bands[band]]
+
+
+def walk_corpus(dimensions, count, steps, seed):
+    """
+    A reproducible corpus of count boards, each a random walk of the given
+    number of steps from the goal. Used for 15 and 24-puzzles, where
+    random permutations are far too hard for most of the algorithms
+    """
+    rng = random.Random(seed)
+    return [{"board": random_walk(dimensions, steps, rng), "optimal_depth": None}
+            for _ in range(count)]
+
+
+def file_corpus(path):
+    """
+    A corpus read from a file with one board per line, either comma or
+    space separated, e.g. Korf's 100 15-puzzle instances. A line may end
+    with the board's optimal depth after a colon: 14,13,15,...,3:57
+    """
+    corpus = []
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            board, _, depth = line.partition(":")
+            corpus.append({"board": [int(x) for x in board.replace(",", " ").split()],
+                           "optimal_depth": int(depth) if depth.strip() else None})
+    return corpus
+
+
+def run_instance(method, board, timeout, pdb_path):
+    """
+    Runs in a fresh worker process for every instance, so that the peak
+    memory reported by ru_maxrss belongs to this instance alone (or to the
+    biggest of its own worker processes, for hda)
+    """
+    batch.init_worker(pdb_path)
+    start = time.perf_counter()
+    record = batch.solve_board(method, board, timeout)
+    record["wall_time"] = time.perf_counter() - start
+    record["peak_memory_kb"] = max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+                                   resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+    return record
+
+
+def report_instance(queue, method, board, timeout, pdb_path):
+    """
+    The target of a benchmark process: puts (None, record) on the queue, or
+    (exception, None) if the run raised
+    """
+    try:
+        queue.put((None, run_instance(method, board, timeout, pdb_path)))
+    except Exception as e:
+        queue.put((e, None))
+
+
+def run_isolated(context, method, board, timeout, pdb_path):
+    """
+    Runs one instance in a process of its own and returns its record.
+    Not a multiprocessing Pool, whose daemonic workers can't start the
+    processes of hda, nor a ProcessPoolExecutor, which only replaces its
+    workers after every task from Python 3.11 on
+    """
+    queue = context.Queue()
+    process = context.Process(target=report_instance,
+                              args=(queue, method, board, timeout, pdb_path))
+    process.start()
+    try:
+        while process.is_alive():
+            try:
+                error, record = queue.get(timeout=1)
+                break
+            except Empty:
+                pass
+        else:
+            # The process is gone, but what it put may still be on its way
+            try:
+                error, record = queue.get(timeout=1)
+            except Empty:
+                raise RuntimeError("Benchmark process for %s on %s died with "
+                                   "exit code %s" % (method, board, process.exitcode))
+    finally:
+        process.join()
+    if error is not None:
+        raise error
+    return record
+
+
+def run_benchmark(corpus, methods, timeout=None, pdb_path=None):
+    """
+    Runs every method on every instance of the corpus, one at a time so
+    that timings aren't skewed by other runs, and returns the results
+    """
+    results = []
+    context = multiprocessing.get_context("spawn")
+    for index, instance in enumerate(corpus):
+        board = ",".join(str(x) for x in instance["board"])
+        for method in methods:
+            record = run_isolated(context, method, board, timeout, pdb_path)
+            result = {
+                "instance": index,
+                "board": board,
+                "optimal_depth": instance["optimal_depth"],
+                "method": method,
+                "status": record["status"],
+                "cost_of_path": record.get("cost_of_path"),
+                "nodes_expanded": record.get("nodes_expanded"),
+                "nodes_per_sec": None,
+                "wall_time": record["wall_time"],
+                "peak_memory_kb": record["peak_memory_kb"],
+            }
+            if record.get("running_time"):
+                result["nodes_per_sec"] = record["nodes_expanded"] / record["running_time"]
+            logging.info("#%d %s: %s, %s nodes in %.3fs", index, method,
+                         result["status"], result["nodes_expanded"],
+                         result["wall_time"])
+            results.append(result)
+    return results
+
+
+def summarize(results):
+    """
+    Totals per method over the instances it solved
+    """
+    summary = {}
+    for result in results:
+        totals = summary.setdefault(result["method"], {
+            "solved": 0, "failed": 0, "nodes_expanded": 0, "wall_time": 0.0,
+            "max_peak_memory_kb": 0})
+        if result["status"] != "solved":
+            totals["failed"] = totals["failed"] + 1
+            continue
+        totals["solved"] = totals["solved"] + 1
+        totals["nodes_expanded"] = totals["nodes_expanded"] + result["nodes_expanded"]
+        totals["wall_time"] = totals["wall_time"] + result["wall_time"]
+        totals["max_peak_memory_kb"] = max(totals["max_peak_memory_kb"],
+                                           result["peak_memory_kb"])
+    for totals in summary.values():
+        totals["nodes_per_sec"] = (totals["nodes_expanded"] / totals["wall_time"]
+                                   if totals["wall_time"] else None)
+    return summary
+
+
+def find_regressions(results, baseline, tolerance):
+    """
+    Compares results against the results of a baseline run, matching runs
+    by board and method. Returns a list of human readable regressions:
+    runs that no longer get solved, that find longer paths, that expand more
+    nodes (more than the tolerance allows, for NONDETERMINISTIC_METHODS),
+    or that take more time or memory than the tolerance allows
+    """
+    previous = {(r["board"], r["method"]): r for r in baseline["results"]}
+    regressions = []
+    for result in results:
+        old = previous.get((result["board"], result["method"]))
+        if old is None or old["status"] != "solved":
+            continue
+        name = "#%d %s" % (result["instance"], result["method"])
+        if result["status"] != "solved":
+            regressions.append("%s: was solved, now %s" % (name, result["status"]))
+            continue
+        if result["cost_of_path"] > old["cost_of_path"]:
+            regressions.append("%s: path of %d moves, was %d" %
+                               (name, result["cost_of_path"], old["cost_of_path"]))
+        allowed_nodes = old["nodes_expanded"]
+        if result["method"] in NONDETERMINISTIC_METHODS:
+            allowed_nodes = allowed_nodes * (1 + tolerance)
+        if result["nodes_expanded"] > allowed_nodes:
+            regressions.append("%s: expanded %d nodes, was %d" %
+                               (name, result["nodes_expanded"], old["nodes_expanded"]))
+        if (result["wall_time"] > old["wall_time"] * (1 + tolerance) and
+                result["wall_time"] - old["wall_time"] > MIN_TIME_DELTA):
+            regressions.append("%s: took %.3fs, was %.3fs" %
+                               (name, result["wall_time"], old["wall_time"]))
+        if (result["peak_memory_kb"] > old["peak_memory_kb"] * (1 + tolerance) and
+                result["peak_memory_kb"] - old["peak_memory_kb"] > MIN_MEMORY_DELTA):
+            regressions.append("%s: peak memory %dKB, was %dKB" %
+                               (name, result["peak_memory_kb"], old["peak_memory_kb"]))
+    return regressions
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO,
+                        format='%(asctime)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description="Benchmarks the n-puzzle solvers")
+    parser.add_argument("--corpus", default="8",
+                        help="8 for the stratified 8-puzzle corpus, 15 or 24 for "
+                             "random walk corpora, korf100 for Korf's 100 "
+                             "15-puzzle instances, or a file of boards; default 8")
+    parser.add_argument("--count", type=int, default=5,
+                        help="boards per depth band for the 8-puzzle corpus, "
+                             "boards in total for random walk corpora")
+    parser.add_argument("--walk", type=int, default=40,
+                        help="length of the random walks for 15/24 corpora")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--methods", nargs="+", choices=ALGORITHMS, default=ALGORITHMS)
+    parser.add_argument("--timeout", type=float, default=60,
+                        help="time limit per run, in seconds")
+    parser.add_argument("--pdb", default=None,
+                        help="pattern database file to use as the heuristic")
+    parser.add_argument("--output", default="benchmark.json",
+                        help="file to write the results to")
+    parser.add_argument("--baseline", default=None,
+                        help="results of an earlier run to check for regressions")
+    parser.add_argument("--tolerance", type=float, default=0.2,
+                        help="relative slowdown/growth allowed before a run is "
+                             "flagged, default 0.2")
+    arguments = parser.parse_args(sys.argv[1:])
+
+    if arguments.corpus == "8":
+        corpus = eight_puzzle_corpus(arguments.count, arguments.seed)
+    elif arguments.corpus in ("15", "24"):
+        dimensions = 4 if arguments.corpus == "15" else 5
+        corpus = walk_corpus(dimensions, arguments.count, arguments.walk, arguments.seed)
+    elif arguments.corpus == "korf100":
+        corpus = file_corpus(KORF100_PATH)
+    else:
+        corpus = file_corpus(arguments.corpus)
+
+    results = run_benchmark(corpus, arguments.methods, arguments.timeout, arguments.pdb)
+    summary = summarize(results)
+    with open(arguments.output, "w") as out:
+        json.dump({"corpus": arguments.corpus, "seed": arguments.seed,
+                   "results": results, "summary": summary}, out, indent=2)
+    for method, totals in summary.items():
+        print("%-6s solved %3d failed %3d nodes %10d time %8.3fs nodes/s %s" %
+              (method, totals["solved"], totals["failed"], totals["nodes_expanded"],
+               totals["wall_time"], "%.0f" % totals["nodes_per_sec"]
+               if totals["nodes_per_sec"] else "-"))
+
+    if arguments.baseline is not None:
+        with open(arguments.baseline) as f:
+            baseline = json.load(f)
+        regressions = find_regressions(results, baseline, arguments.tolerance)
+        for regression in regressions:
+            print("REGRESSION " + regression)
+        if regressions:
+            sys.exit(1)
+        print("No regressions against " + arguments.baseline)
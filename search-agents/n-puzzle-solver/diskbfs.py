@@ -0,0 +1,311 @@
+import os
+import sys
+import json
+import time
+import heapq
+import struct
+import logging
+import argparse
+
+from npuzzle import (MOVES, move_code_table, pack_tiles, search_counters, tile_bits,
+                     undo_move)
+
+# A state on disk is its packed key followed by a byte holding its blank's
+# index (high 6 bits) and the code of the move that reached it (low 2 bits)
+RECORD = struct.Struct("<QB")
+
+# Keys have to fit the 64 bits of a record
+MAX_TILES = 16
+
+# Records generated before a sorted run is written out, and records read or
+# written at once
+RUN_SIZE = 1 << 20
+IO_RECORDS = 1 << 14
+IO_BUFFER = RECORD.size * IO_RECORDS
+
+MANIFEST = "manifest.json"
+
+
+def layer_path(work_dir, depth):
+    return os.path.join(work_dir, "layer-%03d.bin" % depth)
+
+
+def read_records(path):
+    """
+    Yields the (key, info) records of a file, reading it sequentially a
+    buffer at a time
+    """
+    with open(path, "rb", buffering=0) as f:
+        while True:
+            chunk = f.read(IO_BUFFER)
+            if not chunk:
+                return
+            yield from RECORD.iter_unpack(chunk)
+
+
+def write_records(path, records):
+    """
+    Writes records to path, a buffer at a time, through a temporary file that
+    is only renamed to path once complete. Returns the number written
+    """
+    temporary = path + ".tmp"
+    count = 0
+    buffer = bytearray()
+    with open(temporary, "wb", buffering=0) as f:
+        for record in records:
+            buffer += RECORD.pack(*record)
+            count = count + 1
+            if len(buffer) >= IO_BUFFER:
+                f.write(buffer)
+                buffer.clear()
+        f.write(buffer)
+    os.replace(temporary, path)
+    return count
+
+
+def unique(records):
+    """
+    Drops the records whose key is the same as the one before, from records
+    sorted by key
+    """
+    last = None
+    for record in records:
+        if record[0] != last:
+            last = record[0]
+            yield record
+
+
+def not_in(records, paths):
+    """
+    Drops the records whose key is in any of the layer files at paths,
+    merging the sorted records against the sorted layers as they stream
+    """
+    layers = [read_records(path) for path in paths]
+    heads = [next(layer, None) for layer in layers]
+    for record in records:
+        key = record[0]
+        seen = False
+        for i, layer in enumerate(layers):
+            while heads[i] is not None and heads[i][0] < key:
+                heads[i] = next(layer, None)
+            if heads[i] is not None and heads[i][0] == key:
+                seen = True
+        if not seen:
+            yield record
+
+
+def expand(records, dimensions):
+    """
+    Yields the (key, info) records of every child of the given records
+    """
+    bits = tile_bits(dimensions)
+    mask = (1 << bits) - 1
+    moves = move_code_table(dimensions)
+    for key, info in records:
+        blank = info >> 2
+        for new_blank, code in moves[blank]:
+            tile = (key >> (new_blank * bits)) & mask
+            yield (key - (tile << (new_blank * bits)) + (tile << (blank * bits)),
+                   new_blank << 2 | code)
+
+
+def write_run(work_dir, index, records):
+    """
+    Sorts a run of records by key, drops duplicates and writes it out
+    """
+    records.sort()
+    path = os.path.join(work_dir, "run-%03d.bin" % index)
+    write_records(path, unique(records))
+    return path
+
+
+class Manifest:
+    """
+    What a run in a work directory has got through: the board it started
+    from, and the number of states of every layer written out so far.
+    Saved after every layer, through a rename, so a run picks up from the
+    last complete layer after an interruption
+    """
+
+    def __init__(self, work_dir, tiles):
+        self.path = os.path.join(work_dir, MANIFEST)
+        self.tiles = list(tiles)
+        self.layers = []
+        self.complete = False
+        if os.path.exists(self.path):
+            with open(self.path) as f:
+                saved = json.load(f)
+            if saved["tiles"] != self.tiles:
+                raise ValueError(work_dir + " holds a search from another board")
+            self.layers = saved["layers"]
+            self.complete = saved["complete"]
+
+    def save(self):
+        temporary = self.path + ".tmp"
+        with open(temporary, "w") as f:
+            json.dump({"tiles": self.tiles, "layers": self.layers,
+                       "complete": self.complete}, f)
+        os.replace(temporary, self.path)
+
+
+def bfs_layers(tiles, work_dir, run_size=RUN_SIZE, max_depth=None):
+    """
+    Breadth first search a layer at a time, with every layer kept on disk
+    in work_dir as a file of records sorted by key. The children of a layer
+    are generated in runs of run_size records, each sorted and written out,
+    then the runs are merged, duplicates dropped, and states already in the
+    last two layers dropped by merging against those files. Only a run is
+    ever held in memory. Yields (depth, number of states) for every layer,
+    those already on disk from an earlier, interrupted run included
+    """
+    size = len(tiles)
+    if size > MAX_TILES:
+        raise ValueError("Disk BFS supports boards of up to %d tiles" % MAX_TILES)
+    dimensions = int(size ** 0.5)
+    os.makedirs(work_dir, exist_ok=True)
+    manifest = Manifest(work_dir, tiles)
+    if not manifest.layers:
+        root = (pack_tiles(tiles, tile_bits(dimensions)), tiles.index(0) << 2)
+        write_records(layer_path(work_dir, 0), [root])
+        manifest.layers.append(1)
+        manifest.save()
+    for depth, count in enumerate(manifest.layers):
+        yield depth, count
+
+    depth = len(manifest.layers) - 1
+    while not manifest.complete and (max_depth is None or depth < max_depth):
+        runs = []
+        buffer = []
+        for record in expand(read_records(layer_path(work_dir, depth)), dimensions):
+            buffer.append(record)
+            if len(buffer) >= run_size:
+                runs.append(write_run(work_dir, len(runs), buffer))
+                buffer = []
+        if buffer or not runs:
+            runs.append(write_run(work_dir, len(runs), buffer))
+
+        previous = [layer_path(work_dir, d) for d in (depth - 1, depth) if d >= 0]
+        merged = unique(heapq.merge(*[read_records(run) for run in runs]))
+        count = write_records(layer_path(work_dir, depth + 1), not_in(merged, previous))
+        for run in runs:
+            os.remove(run)
+        depth = depth + 1
+        if count:
+            manifest.layers.append(count)
+        else:
+            os.remove(layer_path(work_dir, depth))
+            manifest.complete = True
+        manifest.save()
+        if count:
+            yield depth, count
+
+
+def find_record(path, key):
+    """
+    The record of key in a sorted layer file, found by binary search on the
+    file, None if it isn't there
+    """
+    with open(path, "rb") as f:
+        low = 0
+        high = os.fstat(f.fileno()).st_size // RECORD.size
+        while low < high:
+            middle = (low + high) // 2
+            f.seek(middle * RECORD.size)
+            record = RECORD.unpack(f.read(RECORD.size))
+            if record[0] == key:
+                return record
+            if record[0] < key:
+                low = middle + 1
+            else:
+                high = middle
+    return None
+
+
+def recover_path(work_dir, depth, key, dimensions):
+    """
+    Walks back from the state with the given key in layer depth to the
+    root, undoing the move recorded for each state on the packed key and
+    looking the parent up in the layer before
+    """
+    moves = []
+    while depth > 0:
+        info = find_record(layer_path(work_dir, depth), key)[1]
+        empty_index, code = info >> 2, info & 3
+        moves.append(MOVES[code])
+        key = undo_move(key, empty_index, code, dimensions)[0]
+        depth = depth - 1
+    moves.reverse()
+    return moves
+
+
+def solve_external(initial_state, work_dir, progress=None, run_size=RUN_SIZE):
+    """
+    Solves a board with the disk based BFS, stopping at the goal's layer,
+    then recovers the path from the layer files. Returns the same stats
+    dict as NPuzzleSolver.solve(). A run interrupted part way picks up from
+    its last complete layer when solved again with the same work_dir. The
+    layer files are left in work_dir; nodes_expanded counts every state of
+    the layers before the goal's
+    """
+    start_time = time.time()
+    dimensions = initial_state.dimensions
+    size = dimensions * dimensions
+    goal_key = pack_tiles(list(range(size)), tile_bits(dimensions))
+    nodes_expanded = 0
+    pushes = 0
+    for depth, count in bfs_layers(initial_state.tiles, work_dir, run_size):
+        logging.info("Layer %d: %d states", depth, count)
+        if progress is not None:
+            counters = search_counters(nodes_expanded, nodes_expanded, pushes, 0, 0)
+            counters["algo"] = "bfs"
+            counters["layer"] = depth
+            counters["layer_states"] = count
+            counters["elapsed"] = time.time() - start_time
+            progress(counters)
+        if find_record(layer_path(work_dir, depth), goal_key) is not None:
+            soln = recover_path(work_dir, depth, goal_key, dimensions)
+            stats = {}
+            stats["nodes_expanded"] = nodes_expanded
+            stats["search_depth"] = depth
+            stats["max_search_depth"] = depth
+            stats["cost_of_path"] = len(soln)
+            stats["time"] = time.time() - start_time
+            stats["path"] = soln
+            stats["counters"] = search_counters(nodes_expanded, nodes_expanded,
+                                                pushes, 0, 0)
+            return stats
+        nodes_expanded = nodes_expanded + count
+        if depth > 0:
+            pushes = pushes + count
+    logging.error("This is an unsolvable board!")
+    return None
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO,
+                        format='%(asctime)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(
+        description="Sweeps the state space of the n-puzzle breadth first, "
+                    "a layer at a time on disk")
+    parser.add_argument("work_dir", help="directory for the layer files, a "
+                                         "sweep left there is picked up again")
+    parser.add_argument("--dimensions", type=int, default=3,
+                        help="width of the board, 3 by default")
+    parser.add_argument("--board", default=None,
+                        help="comma separated tiles to start from, the goal by default")
+    parser.add_argument("--max-depth", type=int, default=None,
+                        help="layer to stop at")
+    parser.add_argument("--run-size", type=int, default=RUN_SIZE,
+                        help="records sorted in memory at once")
+    arguments = parser.parse_args(sys.argv[1:])
+
+    if arguments.board is not None:
+        tiles = [int(x) for x in arguments.board.split(",")]
+    else:
+        tiles = list(range(arguments.dimensions * arguments.dimensions))
+    total = 0
+    for depth, count in bfs_layers(tiles, arguments.work_dir, arguments.run_size,
+                                   arguments.max_depth):
+        total = total + count
+        print("%d %d" % (depth, count))
+    logging.info("%d states in all", total)
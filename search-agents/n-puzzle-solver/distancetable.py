@@ -0,0 +1,163 @@
+import os
+import sys
+import mmap
+import math
+import struct
+import logging
+import argparse
+from collections import deque as dq
+
+# File layout (little endian): magic (4s), version (B), dimensions (B),
+# followed by (m^2)! bytes, entry r being the distance to the goal of the
+# board whose permutation rank (see rank) is r, or UNREACHABLE
+MAGIC = b"NPDT"
+VERSION = 1
+HEADER = struct.Struct("<4sBB")
+UNREACHABLE = 255
+
+# Where NPuzzleSolver looks for the 8-puzzle table when it isn't given one
+DEFAULT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "8puzzle.table")
+
+# A full table has (m^2)! entries, which only stays small for the 8-puzzle
+MAX_DIMENSIONS = 3
+
+
+def rank(tiles):
+    """
+    The rank of a board among all permutations of its tiles, in
+    lexicographic order, computed from its Lehmer code: for each tile,
+    the number of smaller tiles after it, weighted by the factorial of
+    the number of places left. The smaller tiles after a tile are the
+    smaller tiles less those already seen, which a bitmask of the tiles
+    seen so far counts in one go
+    """
+    size = len(tiles)
+    result = 0
+    seen = 0
+    for i in range(size):
+        tile = tiles[i]
+        smaller_before = bin(seen & ((1 << tile) - 1)).count("1")
+        result = result * (size - i) + tile - smaller_before
+        seen = seen | (1 << tile)
+    return result
+
+
+def build_table(dimensions=3):
+    """
+    Breadth first search from the goal over every board reachable from it,
+    recording each board's distance at its rank. Returns the table
+    """
+    if dimensions > MAX_DIMENSIONS:
+        raise ValueError("Distance tables only go up to %dx%d boards" %
+                         (MAX_DIMENSIONS, MAX_DIMENSIONS))
+    size = dimensions * dimensions
+    table = bytearray([UNREACHABLE]) * math.factorial(size)
+    goal = tuple(range(size))
+    table[rank(goal)] = 0
+    queue = dq([(goal, 0)])
+    reached = 1
+    while queue:
+        tiles, empty = queue.popleft()
+        distance = table[rank(tiles)] + 1
+        row, col = empty // dimensions, empty % dimensions
+        for neighbor, valid in ((empty - dimensions, row > 0),
+                                (empty + dimensions, row < dimensions - 1),
+                                (empty - 1, col > 0),
+                                (empty + 1, col < dimensions - 1)):
+            if not valid:
+                continue
+            child = list(tiles)
+            child[empty], child[neighbor] = child[neighbor], 0
+            child_rank = rank(child)
+            if table[child_rank] == UNREACHABLE:
+                table[child_rank] = distance
+                queue.append((tuple(child), neighbor))
+                reached = reached + 1
+    logging.info("Distance table for %dx%d: %d boards, deepest at %d moves",
+                 dimensions, dimensions, reached,
+                 max(d for d in table if d != UNREACHABLE))
+    return table
+
+
+def write_table(path, dimensions=3):
+    """
+    Builds the table and writes it to path. The file is written under a
+    temporary name and then renamed, so processes opening it never see a
+    partly written table
+    """
+    table = build_table(dimensions)
+    temporary = "%s.%d.tmp" % (path, os.getpid())
+    with open(temporary, "wb") as out:
+        out.write(HEADER.pack(MAGIC, VERSION, dimensions))
+        out.write(table)
+    os.replace(temporary, path)
+
+
+def table_dimensions(path=DEFAULT_PATH, dimensions=3):
+    """
+    The dimensions of the boards the table at path is for, read from its
+    header, or dimensions if there's no table there yet (the size
+    DistanceTable.open would build it for)
+    """
+    if not os.path.exists(path):
+        return dimensions
+    with open(path, "rb") as f:
+        header = f.read(HEADER.size)
+    if len(header) != HEADER.size:
+        raise ValueError(path + " is not a distance table")
+    magic, version, dimensions = HEADER.unpack(header)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError(path + " is not a distance table")
+    return dimensions
+
+
+class DistanceTable:
+    """
+    The exact distance to the goal of every board of one dimension, memory
+    mapped read only from a file written by write_table. Instances are
+    callables taking a State, so they work as an NPuzzleSolver heuristic:
+    a perfect one, which is what the "table" algorithm descends on
+    """
+
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            self.mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, dimensions = HEADER.unpack_from(self.mm, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(path + " is not a distance table")
+        if len(self.mm) != HEADER.size + math.factorial(dimensions * dimensions):
+            raise ValueError(path + " is truncated or corrupt")
+        self.dimensions = dimensions
+
+    @classmethod
+    def open(cls, path=DEFAULT_PATH, dimensions=3):
+        """
+        Loads the table at path, building it first if there isn't one yet
+        """
+        if not os.path.exists(path):
+            logging.info("Building distance table %s", path)
+            write_table(path, dimensions)
+        return cls(path)
+
+    def __call__(self, state):
+        """
+        The number of moves between a state and the goal
+        """
+        if state.dimensions != self.dimensions:
+            raise ValueError("Distance table is for %dx%d boards" %
+                             (self.dimensions, self.dimensions))
+        return self.mm[HEADER.size + rank(state.tiles)]
+
+    def close(self):
+        self.mm.close()
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO,
+                        format='%(asctime)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(
+        description="Builds the exact distance table for the 8-puzzle")
+    parser.add_argument("output", nargs="?", default=DEFAULT_PATH,
+                        help="file to write the table to")
+    arguments = parser.parse_args(sys.argv[1:])
+    write_table(arguments.output)
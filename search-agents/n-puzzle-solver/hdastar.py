@@ -0,0 +1,243 @@
+import os
+import time
+import queue
+import logging
+import multiprocessing
+from heapq import heappush, heappop
+
+from npuzzle import (MOVES, State, goal_key, manhattan_table, move_code_table,
+                     search_counters, tile_bits)
+
+# Nodes bound for the same worker are sent together once there are this
+# many of them, and whatever is left is sent after every round of expansions
+BATCH_SIZE = 256
+EXPANSIONS_PER_ROUND = 64
+
+# Seconds a worker with nothing to do waits on its inbox before checking
+# whether the search is over, and between the coordinator's checks
+IDLE_WAIT = 0.005
+POLL_INTERVAL = 0.002
+
+# Multiplier spreading packed keys over workers (see owner)
+HASH_MULTIPLIER = 0x9E3779B97F4A7C15
+HASH_MASK = (1 << 64) - 1
+
+
+def owner(key, workers):
+    """
+    The worker a state belongs to. The low bits of a packed key are the
+    tiles of the first cells, which vary little between nearby states, so
+    the key is scrambled by a multiplicative hash first
+    """
+    return (((key * HASH_MULTIPLIER) & HASH_MASK) >> 32) % workers
+
+
+def run_worker(index, workers, dimensions, heuristic, root, inboxes, results,
+               incumbent, sent, received, idle, done):
+    """
+    One HDA* worker. It keeps the open and closed lists of the states it
+    owns, expands them in A* order and sends the children it doesn't own to
+    their owners, a batch at a time. Nodes are (f, h, key, blank, g, path)
+    tuples, path being the moves from the initial state packed 2 bits to a
+    move, so no parent pointers have to cross processes. A goal popped off
+    the open list sets the incumbent cost if it's cheaper, and nodes with
+    f at or over the incumbent are left alone. Once done is set, the worker
+    puts its counters and best path on results
+    """
+    bits = tile_bits(dimensions)
+    mask = (1 << bits) - 1
+    final_key = goal_key(dimensions)
+    moves = move_code_table(dimensions)
+    distances = manhattan_table(dimensions)
+    inbox = inboxes[index]
+    outgoing = [[] for _ in range(workers)]
+    open_list = []
+    best_g = {}
+    best = None
+    nodes_expanded = 0
+    pops = 0
+    pushes = 0
+    duplicates = 0
+    evaluations = 0
+    maxdepth = 0
+
+    def insert(node):
+        # A node is only queued if it's the cheapest path to its state yet
+        if best_g.get(node[2], node[4] + 1) <= node[4]:
+            return False
+        best_g[node[2]] = node[4]
+        heappush(open_list, node)
+        return True
+
+    def flush(destination):
+        sent[index] = sent[index] + 1
+        inboxes[destination].put(outgoing[destination])
+        outgoing[destination] = []
+
+    if root is not None:
+        insert(root)
+
+    while not done.is_set():
+        # Take in everything waiting in the inbox, waiting a little for
+        # more when there's nothing to expand
+        limit = incumbent.value
+        busy = bool(open_list) and open_list[0][0] < limit
+        while True:
+            try:
+                batch = inbox.get(timeout=IDLE_WAIT) if not busy else inbox.get_nowait()
+            except queue.Empty:
+                break
+            idle[index] = 0
+            received[index] = received[index] + 1
+            for node in batch:
+                if insert(node):
+                    pushes = pushes + 1
+                else:
+                    duplicates = duplicates + 1
+            busy = bool(open_list) and open_list[0][0] < limit
+        if not busy:
+            idle[index] = 1
+            continue
+        idle[index] = 0
+
+        for _ in range(EXPANSIONS_PER_ROUND):
+            if not open_list or open_list[0][0] >= limit:
+                break
+            f, h, key, blank, g, path = heappop(open_list)
+            pops = pops + 1
+            if best_g[key] != g:
+                continue
+            if key == final_key:
+                with incumbent.get_lock():
+                    if g < incumbent.value:
+                        incumbent.value = g
+                    limit = incumbent.value
+                if best is None or g < best[0]:
+                    best = (g, path)
+                continue
+
+            nodes_expanded = nodes_expanded + 1
+            # Never undo the move that got here; codes 0/1 and 2/3 undo each other
+            undo = (path & 3) ^ 1 if g else -1
+            for new_blank, code in moves[blank]:
+                if code == undo:
+                    duplicates = duplicates + 1
+                    continue
+                tile = (key >> (new_blank * bits)) & mask
+                child_key = key - (tile << (new_blank * bits)) + (tile << (blank * bits))
+                if heuristic is None:
+                    child_h = h + distances[tile][blank] - distances[tile][new_blank]
+                else:
+                    child_h = heuristic(State.from_key(child_key, dimensions, new_blank))
+                evaluations = evaluations + 1
+                child = (g + 1 + child_h, child_h, child_key, new_blank, g + 1,
+                         (path << 2) | code)
+                if g + 1 > maxdepth:
+                    maxdepth = g + 1
+                destination = owner(child_key, workers)
+                if destination == index:
+                    if insert(child):
+                        pushes = pushes + 1
+                    else:
+                        duplicates = duplicates + 1
+                else:
+                    outgoing[destination].append(child)
+                    if len(outgoing[destination]) >= BATCH_SIZE:
+                        flush(destination)
+        for destination in range(workers):
+            if outgoing[destination]:
+                flush(destination)
+
+    results.put((index, best, search_counters(nodes_expanded, pops, pushes,
+                                              duplicates, evaluations), maxdepth))
+
+
+def solve_parallel(initial_state, workers=None, heuristic=None):
+    """
+    Hash distributed A* (HDA*) over worker processes. Every state belongs to
+    the worker its packed key hashes to (see owner), which alone keeps its
+    open and closed entries, so duplicates are caught without any shared
+    table. The search is over once every worker is idle (nothing on its
+    open list under the incumbent cost) and every batch sent has been
+    received, seen the same in two checks in a row. Nothing cheaper than
+    the incumbent can be left then, so the path has the same, optimal, cost
+    as the one ast finds, though it may be a different path of that cost.
+    Workers are forked, so they inherit the heuristic (a pattern database
+    stays mapped once). Returns the same stats dict as NPuzzleSolver.solve()
+    """
+    start_time = time.time()
+    workers = workers or os.cpu_count()
+    dimensions = initial_state.dimensions
+    context = multiprocessing.get_context("fork")
+    h = initial_state.h if heuristic is None else heuristic(initial_state)
+    root = (h, h, initial_state.key, initial_state.empty_index, 0, 0)
+    root_owner = owner(initial_state.key, workers)
+
+    inboxes = [context.Queue() for _ in range(workers)]
+    results = context.Queue()
+    incumbent = context.Value("i", 2 ** 31 - 1)
+    sent = context.Array("q", workers, lock=False)
+    received = context.Array("q", workers, lock=False)
+    idle = context.Array("b", workers, lock=False)
+    done = context.Event()
+    processes = [context.Process(
+        target=run_worker,
+        args=(i, workers, dimensions, heuristic, root if i == root_owner else None,
+              inboxes, results, incumbent, sent, received, idle, done),
+        daemon=True)
+        for i in range(workers)]
+
+    # Whatever ends the search, a timeout signal or an error included, the
+    # workers are stopped and reaped before returning, so none outlives it
+    try:
+        for process in processes:
+            process.start()
+
+        # Termination detection: counts are only trusted when two snapshots
+        # in a row agree, as a worker can take a batch in between reading
+        # its idle flag and reading the counters
+        previous = None
+        while True:
+            time.sleep(POLL_INTERVAL)
+            snapshot = (all(idle), sum(sent), sum(received))
+            if snapshot[0] and snapshot[1] == snapshot[2] and snapshot == previous:
+                break
+            previous = snapshot
+            if any(process.exitcode is not None for process in processes):
+                raise RuntimeError("An HDA* worker died before the search was over")
+        done.set()
+
+        best = None
+        totals = search_counters(0, 0, 0, 0, 0)
+        maxdepth = 0
+        for _ in range(workers):
+            index, worker_best, counters, worker_maxdepth = results.get()
+            for name, value in counters.items():
+                totals[name] = totals[name] + value
+            maxdepth = max(maxdepth, worker_maxdepth)
+            if worker_best is not None and (best is None or worker_best[0] < best[0]):
+                best = worker_best
+            logging.debug("HDA* worker %d: %d expansions", index, counters["expansions"])
+    finally:
+        done.set()
+        for process in processes:
+            if process.is_alive():
+                process.terminate()
+        for process in processes:
+            if process.pid is not None:
+                process.join()
+    if best is None:
+        logging.error("This is an unsolvable board!")
+        return None
+
+    cost, path = best
+    soln = [MOVES[(path >> (2 * i)) & 3] for i in range(cost - 1, -1, -1)]
+    stats = {}
+    stats["nodes_expanded"] = totals["expansions"]
+    stats["search_depth"] = cost
+    stats["max_search_depth"] = maxdepth
+    stats["cost_of_path"] = len(soln)
+    stats["time"] = time.time() - start_time
+    stats["path"] = soln
+    stats["counters"] = totals
+    return stats
@@ -1,50 +1,231 @@
+import os
 import sys
+import json
+import struct
+import argparse
 import math
 import logging
 import time
 from collections import deque as dq
-from queue import PriorityQueue
+from heapq import heapify, heappush, heappop
 import resource
+from functools import lru_cache
+
+
+# Search algorithms NPuzzleSolver knows about
+ALGORITHMS = ["bfs", "dfs", "ast", "ida", "bibfs", "biast", "vbfs", "table", "ara", "hda"]
+
+# ARA* starts with this weight on h, and lowers it by its step (down to 1)
+# after every solution it finds
+ARA_WEIGHT = 3
+ARA_WEIGHT_STEP = 0.5
+
+# Moves in UDLR order; a move's index is its 2 bit code
+MOVES = ["Up", "Down", "Left", "Right"]
+MOVE_CODES = {"Up": 0, "Down": 1, "Left": 2, "Right": 3}
+
+# The move that undoes a given move
+OPPOSITE_MOVES = {"Up": "Down", "Down": "Up", "Left": "Right", "Right": "Left"}
+
+# Binary results (see encode_moves): a status byte and the number of moves,
+# followed by the moves. Only solved boards have moves
+BINARY_RESULT = struct.Struct("<BI")
+SOLVED = 0
+UNSOLVABLE = 1
+UNSOLVED = 2
+
+# Size of the buffer results are written through
+OUTPUT_BUFFER = 1 << 16
+
+
+def tile_bits(dimensions):
+    """
+    Number of bits used to store one tile in a packed board key: 4 bits
+    for the 8 and 15-puzzles, 5 bits for the 24-puzzle and so on
+    """
+    return max(1, (dimensions * dimensions - 1).bit_length())
+
+
+def pack_tiles(tiles, bits):
+    """
+    Packs a list of tiles into a single int, tile i occupying bits
+    [i * bits, (i + 1) * bits)
+    """
+    key = 0
+    for i in range(len(tiles) - 1, -1, -1):
+        key = (key << bits) | tiles[i]
+    return key
+
+
+def unpack_tiles(key, size, bits):
+    """
+    Inverse of pack_tiles, returns the list of tiles stored in a packed key
+    """
+    mask = (1 << bits) - 1
+    return [(key >> (i * bits)) & mask for i in range(size)]
+
+
+@lru_cache(maxsize=None)
+def manhattan_table(dimensions):
+    """
+    table[tile][index] is the manhattan distance of tile, when sitting at
+    index, from its goal position. Built once per board dimension
+    """
+    size = dimensions * dimensions
+    table = []
+    for tile in range(size):
+        correctRow = tile // dimensions
+        correctCol = tile % dimensions
+        table.append(tuple(abs(i // dimensions - correctRow) +
+                           abs(i % dimensions - correctCol)
+                           for i in range(size)))
+    return tuple(table)
+
+
+@lru_cache(maxsize=None)
+def neighbor_table(dimensions):
+    """
+    table[blank] is (shift, moves) for the blank at index blank: the bit
+    offset of its cell in a packed key, and for each move it can make, in
+    UDLR order, a (new blank index, move, bit offset of that cell) tuple.
+    Built once per board dimension, so no move needs any bounds checks
+    """
+    bits = tile_bits(dimensions)
+    table = []
+    for i in range(dimensions * dimensions):
+        row, col = i // dimensions, i % dimensions
+        moves = []
+        if row > 0:
+            moves.append((i - dimensions, "Up", (i - dimensions) * bits))
+        if row < dimensions - 1:
+            moves.append((i + dimensions, "Down", (i + dimensions) * bits))
+        if col > 0:
+            moves.append((i - 1, "Left", (i - 1) * bits))
+        if col < dimensions - 1:
+            moves.append((i + 1, "Right", (i + 1) * bits))
+        table.append((i * bits, tuple(moves)))
+    return tuple(table)
+
+
+@lru_cache(maxsize=None)
+def move_code_table(dimensions):
+    """
+    neighbor_table with move codes (see MOVE_CODES): table[blank] is the
+    (new blank index, move code) pairs of the moves the blank at index blank
+    can make, in UDLR order
+    """
+    return tuple(tuple((new_index, MOVE_CODES[move]) for new_index, move, _ in moves)
+                 for _, moves in neighbor_table(dimensions))
+
+
+def move_offsets(dimensions):
+    """
+    For the move codes in UDLR order, what each move adds to the blank's index
+    """
+    return (-dimensions, dimensions, -1, 1)
+
+
+def undo_move(key, empty_index, code, dimensions):
+    """
+    The packed key and blank index of the parent of a state, given the code
+    of the move that reached it. The blank came from the parent's blank
+    index, and the tile there now is the one that has to go back to where
+    the blank is
+    """
+    bits = tile_bits(dimensions)
+    parent_index = empty_index - move_offsets(dimensions)[code]
+    tile = (key >> (parent_index * bits)) & ((1 << bits) - 1)
+    return (key - (tile << (parent_index * bits)) + (tile << (empty_index * bits)),
+            parent_index)
+
+
+@lru_cache(maxsize=None)
+def goal_key(dimensions):
+    """
+    The packed key of the final state (0,1,2...m^2-1)
+    """
+    return pack_tiles(list(range(dimensions * dimensions)), tile_bits(dimensions))
 
 
 class State:
     """
     The underlying state of the board. Apart from the configuration, it stores a
     bunch of other meta data like what the parent was and what move on the parent
-    resulted in this state
-    """
-    tiles = []
-    dimensions = 0
-    parent = None
-    depth = 0
-    empty_row = 0
-    empty_col = 0
-    number_of_moves = 0
-    parent_move = None
-
-    # Stats for astar
-    f = 0           # f = g + h
-    g = 0           # g, cost of reaching this state (Equal to the depth of the node)
-    h = 0           # h, heuristic value, here manhattan score
+    resulted in this state.
+
+    The configuration is held as a single packed int (see pack_tiles), which is
+    also what hashing and equality work on. Nodes use __slots__ so a state costs
+    a handful of machine words rather than an instance dict plus a tile list.
+    """
+    __slots__ = ("key", "dimensions", "empty_index", "parent", "parent_move",
+                 "depth", "f", "h")
 
     def __init__(self, state_array, parent=None, depth=0):
         """
         Initialises this state with a confguration, an optional parent and an optional depth
         """
-        self.tiles = state_array
-        self.dimensions = int(math.sqrt(len(self.tiles)))
+        self.dimensions = int(math.sqrt(len(state_array)))
+        self.key = pack_tiles(state_array, tile_bits(self.dimensions))
+        self.empty_index = state_array.index(0)
         self.parent = parent
-        empty_index = state_array.index(0)
-        self.empty_row = int(empty_index / self.dimensions)
-        self.empty_col = empty_index % self.dimensions
+        self.parent_move = None
         self.depth = depth
+        # Stats for astar: f = g + h, where g is the depth of the node and
+        # h the heuristic value, here manhattan score. Only states built
+        # from a tile list compute h in full, states reached by a move
+        # derive it from their parent (see move_empty_to)
+        self.process_astar_stats()
+
+    @classmethod
+    def from_key(cls, key, dimensions, empty_index, parent=None, depth=0):
+        """
+        Builds a state straight from a packed key, without going through
+        a tile list
+        """
+        state = cls.__new__(cls)
+        state.key = key
+        state.dimensions = dimensions
+        state.empty_index = empty_index
+        state.parent = parent
+        state.parent_move = None
+        state.depth = depth
+        state.f = 0
+        state.h = 0
+        return state
+
+    @property
+    def tiles(self):
+        """
+        The configuration of this state as a flat list of tiles
+        """
+        return unpack_tiles(self.key, self.dimensions * self.dimensions,
+                            tile_bits(self.dimensions))
+
+    @property
+    def empty_row(self):
+        return self.empty_index // self.dimensions
+
+    @property
+    def empty_col(self):
+        return self.empty_index % self.dimensions
+
+    @property
+    def g(self):
+        """
+        g, cost of reaching this state (Equal to the depth of the node)
+        """
+        return self.depth
+
+    @property
+    def number_of_moves(self):
+        return self.depth
 
     def __hash__(self):
         """
         Uniqueness of a state is defined just by the internal configuration
-        of its tiles
+        of its tiles, i.e. its packed key
         """
-        return hash(str(self.tiles))
+        return hash(self.key)
 
     def __str__(self):
         """
@@ -52,9 +233,10 @@ class State:
         configuration of the tiles
         """
         res = ""
+        tiles = self.tiles
         for i in range(self.dimensions):
             for j in range(self.dimensions):
-                res = res + str(self.tiles[i * self.dimensions + j]) + " "
+                res = res + str(tiles[i * self.dimensions + j]) + " "
             res = res + "\n"
         return res
     
@@ -64,11 +246,9 @@ class State:
         into sets
         """
         if isinstance(other, State):
-            return other.tiles == self.tiles
+            return other.key == self.key
+        return NotImplemented
 
-    def __ne__(self, other):
-        return (not self.__eq__(other))
-    
     def __lt__(self, other):
         """
         Compares states by their manhattan scores. 
@@ -128,17 +308,24 @@ class State:
     def move_empty_to(self, row, col):
         """
         Helper function used by the movement functions that actually
-        does the work of shifting the empty space around
-        """
-        new_list = list(self.tiles)
-        existing_element = new_list[row *
-                                    self.dimensions + col]
-        new_list[row * self.dimensions + col] = 0
-        new_list[self.empty_row * self.dimensions +
-                 self.empty_col] = existing_element
-        new_state = State(new_list, self, self.depth + 1)
-        new_state.process_astar_stats()
-        logging.debug("\n" + str(new_state))
+        does the work of shifting the empty space around.
+        Only existing_element changes place, so the manhattan score of the
+        new state is the parent's adjusted by that one tile's change
+        """
+        index = row * self.dimensions + col
+        bits = tile_bits(self.dimensions)
+        existing_element = (self.key >> (index * bits)) & ((1 << bits) - 1)
+        # The empty tile is 0, so swapping it with existing_element just
+        # moves existing_element's bits over to the empty slot
+        new_key = (self.key - (existing_element << (index * bits)) +
+                   (existing_element << (self.empty_index * bits)))
+        new_state = State.from_key(new_key, self.dimensions, index, self,
+                                   self.depth + 1)
+        distances = manhattan_table(self.dimensions)[existing_element]
+        new_state.h = (self.h + distances[self.empty_index] -
+                       distances[index])
+        new_state.f = new_state.depth + new_state.h
+        logging.debug("\n%s", new_state)
         return new_state
 
     def is_valid(self, row, col):
@@ -152,40 +339,42 @@ class State:
 
     def generate_possible_states(self):
         """
-        Generates all possible states given a state. Moves are performed using in UDLR order
+        Generates all possible states given a state. Moves are performed using in UDLR order.
+        The move that would undo the one that led here is never made, its
+        state is the parent, which every search has already seen. Moves come
+        from neighbor_table and are done as in move_empty_to, inline
         """
         children = []
-        up = self.move_up()
-        if up is not None:
-            up.parent_move = "Up"
-            up.number_of_moves = self.number_of_moves + 1
-            children.append(up)
-
-        down = self.move_down()
-        if down is not None:
-            down.parent_move = "Down"
-            down.number_of_moves = self.number_of_moves + 1
-            children.append(down)
-
-        left = self.move_left()
-        if left is not None:
-            left.parent_move = "Left"
-            left.number_of_moves = self.number_of_moves + 1
-            children.append(left)
-
-        right = self.move_right()
-        if right is not None:
-            right.parent_move = "Right"
-            right.number_of_moves = self.number_of_moves + 1
-            children.append(right)
-
+        dimensions = self.dimensions
+        key = self.key
+        empty_index = self.empty_index
+        depth = self.depth + 1
+        h = self.h
+        mask = (1 << tile_bits(dimensions)) - 1
+        distances = manhattan_table(dimensions)
+        undo = OPPOSITE_MOVES.get(self.parent_move)
+        empty_shift, moves = neighbor_table(dimensions)[empty_index]
+        for index, move, shift in moves:
+            if move == undo:
+                continue
+            existing_element = (key >> shift) & mask
+            child = State.__new__(State)
+            child.key = key - (existing_element << shift) + (existing_element << empty_shift)
+            child.dimensions = dimensions
+            child.empty_index = index
+            child.parent = self
+            child.parent_move = move
+            child.depth = depth
+            tile_distances = distances[existing_element]
+            child.h = h + tile_distances[empty_index] - tile_distances[index]
+            child.f = depth + child.h
+            children.append(child)
         return children
     
     def process_astar_stats(self):
         """
-        Computes a stats needed for astar: f,g, and h
+        Computes a stats needed for astar: f,g, and h, from scratch
         """
-        self.g = self.depth
         self.h = self.compute_manhattan()
         self.f = self.g + self.h
     
@@ -195,52 +384,451 @@ class State:
         distances of all misplaced non empty tiles from their actual positions
         """
         dist = 0
-        for i in range(0,len(self.tiles)):
-            tile = self.tiles[i]
+        tiles = self.tiles
+        table = manhattan_table(self.dimensions)
+        for i in range(0,len(tiles)):
+            tile = tiles[i]
             if tile != 0:
-                rowTile = i // self.dimensions
-                colTile = i % self.dimensions
-                correctRow = tile // self.dimensions
-                correctCol = tile % self.dimensions
-                md = abs(rowTile - correctRow) + abs(colTile - correctCol)
-                dist = dist + md
+                dist = dist + table[tile][i]
         return dist
 
 
-class NPuzzleSolver:
+def validate_board(tiles):
+    """
+    Raises a ValueError unless tiles is a square board holding each of
+    0,1,2...m^2-1 exactly once
+    """
+    dimensions = int(math.sqrt(len(tiles)))
+    if len(tiles) == 0 or dimensions * dimensions != len(tiles):
+        raise ValueError("A board must have m^2 tiles, got %d" % len(tiles))
+    if sorted(tiles) != list(range(len(tiles))):
+        raise ValueError("A board must hold each of 0..%d exactly once" %
+                         (len(tiles) - 1))
+
+
+def parse_board(text):
+    """
+    The tiles of a comma separated board, after validate_board. Raises a
+    ValueError for anything that isn't a valid board
+    """
+    try:
+        tiles = [int(x) for x in text.split(",")]
+    except ValueError:
+        raise ValueError("A board must be comma separated integers, got " + text)
+    validate_board(tiles)
+    return tiles
+
+
+def check_heuristic(heuristic, tiles):
+    """
+    Raises a ValueError if heuristic, a table built for boards of one size
+    such as a patterndb.PatternDatabase, can't score the board tiles
+    """
+    dimensions = heuristic.dimensions
+    if len(tiles) != dimensions * dimensions:
+        raise ValueError("The heuristic is for %dx%d boards, not %d tiles" %
+                         (dimensions, dimensions, len(tiles)))
+
+
+def is_solvable(tiles):
+    """
+    Checks, without searching, whether a board can reach the final state
+    (0,1,2...m^2-1). Every move swaps the blank with a tile, which flips the
+    parity of the board seen as a permutation, and moves the blank one cell
+    nearer to or further from its goal cell (the top left corner). The sum
+    of the permutation's parity and the blank's distance from its goal cell
+    is therefore the same for every board reachable from another, and the
+    board is solvable exactly when that sum is even, as it is for the goal.
+    This holds for odd and even widths alike and takes O(n) for n tiles.
+    Raises a ValueError for anything that isn't a valid board
+    """
+    validate_board(tiles)
+    dimensions = int(math.sqrt(len(tiles)))
+
+    # A permutation made of cycles of lengths l1, l2... is the product of
+    # (l1 - 1) + (l2 - 1) + ... transpositions
+    visited = [False] * len(tiles)
+    transpositions = 0
+    for start in range(len(tiles)):
+        length = 0
+        i = start
+        while not visited[i]:
+            visited[i] = True
+            i = tiles[i]
+            length = length + 1
+        if length > 0:
+            transpositions = transpositions + length - 1
+
+    blank = tiles.index(0)
+    distance = blank // dimensions + blank % dimensions
+    return (transpositions + distance) % 2 == 0
+
+
+def encode_moves(path):
+    """
+    Packs a path into bytes at 2 bits per move (its code, see MOVES), four
+    moves to a byte, the first move in the lowest bits of the first byte
+    """
+    codes = [MOVE_CODES[move] for move in path]
+    codes.extend([0] * (-len(codes) % 4))
+    return bytes(codes[i] | codes[i + 1] << 2 | codes[i + 2] << 4 | codes[i + 3] << 6
+                 for i in range(0, len(codes), 4))
+
+
+def decode_moves(data, count):
+    """
+    Inverse of encode_moves, the first count moves packed in data
+    """
+    return [MOVES[(data[i >> 2] >> ((i & 3) * 2)) & 3] for i in range(count)]
+
+
+def stats_record(stats):
+    """
+    The fields of a solved board's stats dict that go into a JSON result
+    """
+    record = {}
+    record["path_to_goal"] = stats["path"]
+    record["cost_of_path"] = stats["cost_of_path"]
+    record["nodes_expanded"] = stats["nodes_expanded"]
+    record["search_depth"] = stats["search_depth"]
+    record["max_search_depth"] = stats["max_search_depth"]
+    record["running_time"] = stats["time"]
+    record["counters"] = stats["counters"]
+    record["optimal"] = stats["optimal"]
+    if "suboptimality_bound" in stats:
+        record["suboptimality_bound"] = stats["suboptimality_bound"]
+    record["cached"] = stats.get("cached", False)
+    return record
+
+
+def unsolvable_stats():
+    """
+    The stats dict returned for a board that can't be solved
+    """
+    stats = {}
+    stats["solvable"] = False
+    stats["nodes_expanded"] = 0
+    stats["search_depth"] = 0
+    stats["max_search_depth"] = 0
+    stats["cost_of_path"] = None
+    stats["time"] = 0.0
+    stats["path"] = None
+    return stats
+
+
+def search_counters(expansions, pops, pushes, duplicates, evaluations):
+    """
+    The counters every search keeps, as reported under "counters" in the
+    stats dict and handed to progress hooks
+    """
+    counters = {}
+    counters["expansions"] = expansions
+    counters["pops"] = pops
+    counters["pushes"] = pushes
+    counters["duplicates"] = duplicates
+    counters["heuristic_evaluations"] = evaluations
+    return counters
+
+
+def goal_state(dimensions):
     """
-        Uses the BFS/DFS/A* algos to solve a given n-puzzle board
+    The final state (0,1,2...m^2-1) for a board of the given dimensions
+    """
+    return State(list(range(dimensions * dimensions)))
+
+
+class PriorityFrontier:
+    """
+    The A* frontier. A binary heap (heapq) of (f, h, tiebreak, state) tuples,
+    so ordering is plain tuple comparison: lowest f first, then lowest h,
+    then insertion order. Nothing is locked as the solver is single threaded.
+    Keeps the best g seen for every state on it, which gives O(1) membership
+    and decrease-key by lazy deletion: a cheaper path to a state already on
+    the frontier is pushed as a new entry and the stale entry is skipped
+    when it surfaces
+    """
+
+    def __init__(self):
+        self.heap = []
+        self.best_g = {}
+        self.counter = 0
+
+    def push(self, state):
+        """
+        Adds a state, or lowers its priority if it is already on the frontier
+        with a more expensive path
+        """
+        self.best_g[state.key] = state.depth
+        heappush(self.heap, (state.f, state.h, self.counter, state))
+        self.counter = self.counter + 1
+
+    def pop(self):
+        """
+        Removes and returns the state with the highest priority
+        """
+        while True:
+            state = heappop(self.heap)[3]
+            if self.best_g.get(state.key) == state.depth:
+                del self.best_g[state.key]
+                return state
+
+    def clear(self):
+        """
+        Removes every state from the frontier
+        """
+        self.heap.clear()
+        self.best_g.clear()
+        self.counter = 0
+
+    def reweigh(self, weight):
+        """
+        Recomputes f = g + weight * h for every state on the frontier and
+        rebuilds the heap, dropping stale entries along the way
+        """
+        live = []
+        for entry in self.heap:
+            state = entry[3]
+            if self.best_g.get(state.key) == state.depth:
+                state.f = state.depth + weight * state.h
+                live.append((state.f, state.h, entry[2], state))
+        heapify(live)
+        self.heap = live
+
+    def min_f(self):
+        """
+        The lowest f on the frontier, math.inf if it's empty
+        """
+        heap = self.heap
+        while heap:
+            entry = heap[0]
+            if self.best_g.get(entry[3].key) == entry[3].depth:
+                return entry[0]
+            heappop(heap)
+        return math.inf
+
+    def g_of(self, key):
+        """
+        The cost of the best known path to a state on the frontier, None if
+        it isn't on it
+        """
+        return self.best_g.get(key)
+
+    def __contains__(self, key):
+        return key in self.best_g
+
+    def __len__(self):
+        return len(self.best_g)
+
+
+class NPuzzleSolver:
     """
-    initial_state = None
-    algo = ""
+        Uses the BFS/DFS/A*/IDA* algos, or bidirectional BFS/A*, to solve a
+        given n-puzzle board. vbfs is BFS done a whole layer at a time with
+        NumPy (see vectorbfs.py), for boards of up to 4x4. table doesn't
+        search at all, it walks down an exact distance table (see
+        distancetable.py) in as many steps as the solution has moves.
+        A* and IDA* use the manhattan score as their heuristic unless another
+        one is given: any callable taking a State and returning an admissible
+        estimate of its distance to the goal, e.g. a patterndb.PatternDatabase.
 
-    # The frontier in BFS/DFS is a queue/stack and for A*, its a heap (PriorityQueue)
-    # Frontier set made to test membership in O(1)
-    frontier = None
-    frontier_set = set()
+        All of the search structures below belong to the instance. Nothing
+        is shared between instances, so separate solvers can run at the same
+        time in separate threads or processes. A single instance must not be
+        used from more than one thread at once. Call reset() to reuse an
+        instance for another board; calling solve() again without one
+        searches the same board afresh.
 
-    # All of the fully explored states in this set
-    explored = set()
+        With compact_parents, BFS/DFS/A* don't keep parent pointers on the
+        states they generate. Instead, a dict maps the packed key of each
+        state to the 2 bit code of the move that reached it, which is all
+        it takes to get back to the parent's key. A state that's been
+        expanded is then no longer kept alive by its children, and the path
+        is rebuilt from the dict only once the goal is found.
 
-    def __init__(self, algo, initial_state=None):
-        self.initial_state = initial_state
+        Every search counts its expansions, frontier pops and pushes,
+        duplicates (generated states that were already seen, or pruned) and
+        heuristic evaluations, and returns them under "counters" in the
+        stats dict. On top of that, progress (a callable) is called with a
+        snapshot of the counters every progress_every expansions, and with
+        sample_every set, one in every sample_every expansions of BFS/DFS/A*
+        is timed phase by phase: generating the children (expand), checking
+        them against the seen states (dedupe) and queuing them (push). The
+        mean time per sampled expansion of each phase is returned under
+        "timings". Both are off by default, and cost an int comparison per
+        expansion when off
+
+        max_states bounds the memory of BFS/DFS/A*: once the states they
+        hold (explored, frontier and parents) go past it, the search is
+        dropped and a beam search of beam_width states per layer takes
+        over (see solve_beam). Its paths aren't guaranteed to be optimal,
+        which the stats dict says under "optimal", as it does for every
+        search
+
+        A* can be weighted, ordering its frontier on f = g + weight * h.
+        It then finds paths faster, at most weight times longer than the
+        optimal ones, which is returned as "suboptimality_bound". ara is
+        anytime repairing A* (see solve_anytime), which starts out with
+        weight (ARA_WEIGHT by default) and lowers it by weight_step after
+        every path it finds, for as long as solve() is given. hda is A*
+        spread over workers processes, all cores by default (see hdastar.py).
+        Given a work_dir, BFS keeps its layers on disk there instead of in
+        memory (see diskbfs.py)
+    """
+
+    def __init__(self, algo, initial_state=None, heuristic=None,
+                 compact_parents=False, progress=None, progress_every=10000,
+                 sample_every=0, max_states=None, beam_width=1000,
+                 weight=None, weight_step=ARA_WEIGHT_STEP, workers=None,
+                 work_dir=None):
+        if weight is None:
+            weight = ARA_WEIGHT if algo == "ara" else 1
+        elif weight != 1 and algo not in ("ast", "ara"):
+            raise ValueError("Only ast and ara take a weight")
+        if weight < 1:
+            raise ValueError("The weight on h can't be below 1")
+        self.algo = algo
+        self.weight = weight
+        self.weight_step = weight_step
+        self.workers = workers
+        self.work_dir = work_dir
+        self.heuristic = heuristic
+        self.compact_parents = compact_parents
+        self.progress = progress
+        self.progress_every = progress_every
+        self.sample_every = sample_every
+        self.max_states = max_states
+        self.beam_width = beam_width
+        self.initial_state = None
+        # Set by solve() and cleared by reset(), so that a second solve()
+        # never picks up the leftovers of the first
+        self.searched = False
+
+        # The frontier in BFS/DFS is a queue/stack and for A*, its a heap (PriorityFrontier).
+        # IDA* keeps no frontier, only the current path, and bidirectional
+        # searches keep one per direction for the duration of a solve, as
+        # does vbfs for its layers
         if algo == "bfs" or algo == "dfs":
             self.frontier = dq()
-            self.frontier.append(initial_state)
+        elif algo in ("ida", "bibfs", "biast", "vbfs", "table", "hda"):
+            self.frontier = None
         else:
-            self.frontier = PriorityQueue()
-            self.frontier.put(initial_state)
-        self.frontier_set.add(initial_state)
-        self.algo = algo
+            self.frontier = PriorityFrontier()
+
+        # Frontier set made to test membership in O(1) for BFS/DFS, PriorityFrontier
+        # tracks its own members. It and explored hold the packed keys of states
+        # rather than the states themselves
+        self.frontier_set = set()
+
+        # All of the fully explored states in this set
+        self.explored = set()
+
+        # With compact_parents: packed key -> code of the move that reached it
+        self.parents = {}
+
+        if initial_state is not None:
+            self.reset(initial_state)
+
+    def reset(self, initial_state=None):
+        """
+        Readies the solver for a new search from initial_state, or from the
+        previous initial state if none is given. The frontier and explored
+        containers are emptied and reused rather than replaced
+        """
+        if initial_state is not None:
+            self.initial_state = initial_state
+        if self.initial_state is None:
+            raise ValueError("No initial state to solve from")
+        self.evaluate(self.initial_state)
+        self.frontier_set.clear()
+        self.explored.clear()
+        self.parents.clear()
+        if self.algo == "bfs" or self.algo == "dfs":
+            self.frontier.clear()
+            self.frontier.append(self.initial_state)
+            if self.compact_parents:
+                # Marks the initial state as seen, its move code is never read
+                self.parents[self.initial_state.key] = 0
+        elif self.frontier is not None:
+            self.frontier.clear()
+            self.frontier.push(self.initial_state)
+        self.frontier_set.add(self.initial_state.key)
+        self.searched = False
 
-    def solve(self):
+    def solve(self, time_budget=None):
         """
-        Attempts to solve an n-puzzle and returns a stats
-        dict, or None if no solution exists
+        Attempts to solve an n-puzzle and returns a stats dict. Boards
+        that can't be solved are caught by is_solvable before any search
+        and get the stats of unsolvable_stats, with "solvable" set to False
+        and no path. A solver that has already searched is reset() first.
+        time_budget, in seconds, is how long ara may keep improving its path;
+        it's unbounded if None, and no other algorithm looks at it
+        """
+        if self.initial_state is None:
+            raise ValueError("No initial state to solve from")
+        if self.searched:
+            self.reset()
+        self.searched = True
+        if not is_solvable(self.initial_state.tiles):
+            logging.error("This is an unsolvable board!")
+            return unsolvable_stats()
+        if self.algo == "ida":
+            stats = self.solve_ida()
+        elif self.algo == "bibfs":
+            stats = self.solve_bibfs()
+        elif self.algo == "biast":
+            stats = self.solve_biastar()
+        elif self.algo == "vbfs":
+            # NumPy is only needed for this one
+            from vectorbfs import solve_layered
+            stats = solve_layered(self.initial_state)
+        elif self.algo == "table":
+            stats = self.solve_descent()
+        elif self.algo == "ara":
+            stats = self.solve_anytime(time_budget)
+        elif self.algo == "bfs" and self.work_dir is not None:
+            from diskbfs import solve_external
+            stats = solve_external(self.initial_state, self.work_dir, self.progress)
+        elif self.algo == "hda":
+            from hdastar import solve_parallel
+            stats = solve_parallel(self.initial_state, self.workers, self.heuristic)
+        else:
+            stats = self.solve_frontier()
+        if stats is not None:
+            stats["solvable"] = True
+            # A beam fallback has no bound on how far off optimal it is
+            if self.algo == "ast" and "fallback" not in stats:
+                stats.setdefault("suboptimality_bound", self.weight)
+            stats.setdefault("optimal", self.algo != "dfs" and self.weight == 1)
+        return stats
+
+    def solve_frontier(self):
+        """
+        BFS, DFS and A*, which only differ in the kind of frontier they
+        take states off. Returns a stats dict, or None if the search ran
+        out of states without reaching the goal
         """
         start_time = time.time()
         maxdepth = 0
+        nodes_expanded = 0
+        pops = 0
+        pushes = 0
+        duplicates = 0
+        evaluations = 0
         break_cond = False
+        uninformed = self.algo == "bfs" or self.algo == "dfs"
+        # BFS and DFS with compact_parents need neither explored nor
+        # frontier_set, every state they've ever queued is in parents
+        parents_only = uninformed and self.compact_parents
+
+        # Instrumentation; a next_progress of -1 never comes up
+        debug = logging.getLogger().isEnabledFor(logging.DEBUG)
+        next_progress = self.progress_every if self.progress else -1
+        sample_every = self.sample_every
+        timed = False
+        samples = 0
+        expand_time = 0.0
+        dedupe_time = 0.0
+        push_time = 0.0
 
         while(not break_cond):
             if self.algo == "bfs":
@@ -251,48 +839,625 @@ class NPuzzleSolver:
                 current_state = self.frontier.pop()
             else:
                 # Get element with highest priority if doing A* (Heap)
-                current_state = self.frontier.get()
-            self.frontier_set.remove(current_state)
+                current_state = self.frontier.pop()
+            pops = pops + 1
+            self.frontier_set.discard(current_state.key)
             if (self.isFinalState(current_state)):
-                soln = self.get_solution_moves(current_state)
+                if self.compact_parents:
+                    soln = self.get_compact_solution_moves(current_state)
+                else:
+                    soln = self.get_solution_moves(current_state)
                 end_time = time.time()
                 stats = {}
-                stats["nodes_expanded"] = len(self.explored)
+                stats["nodes_expanded"] = nodes_expanded
                 stats["search_depth"] = current_state.depth
                 stats["max_search_depth"] = maxdepth
                 stats["cost_of_path"] = len(soln)
                 stats["time"] = end_time - start_time
                 stats["path"] = soln
+                stats["counters"] = search_counters(nodes_expanded, pops, pushes,
+                                                    duplicates, evaluations)
+                if sample_every:
+                    stats["timings"] = {
+                        "samples": samples,
+                        "expand": expand_time / samples if samples else 0.0,
+                        "dedupe": dedupe_time / samples if samples else 0.0,
+                        "push": push_time / samples if samples else 0.0,
+                    }
                 return stats
+
+            if sample_every:
+                timed = nodes_expanded % sample_every == 0
+            if timed:
+                samples = samples + 1
+                started = time.perf_counter()
             neighbors = current_state.generate_possible_states()
             if self.algo == "dfs":
                 neighbors.reverse()
+            if timed:
+                expand_time = expand_time + time.perf_counter() - started
 
             for neighbor in neighbors:
-                if neighbor not in self.explored and neighbor not in self.frontier_set:
-                    if self.algo == "bfs" or self.algo == "dfs":
-                        self.frontier.append(neighbor)
-                    else:
-                        self.frontier.put(neighbor)
-                    self.frontier_set.add(neighbor)
-                    if neighbor.depth > maxdepth:
-                        maxdepth = neighbor.depth
-            self.explored.add(current_state)
-            if self.algo == "bfs" or self.algo == "dfs":
-                frontier_sz = len(self.frontier)
-            else:
-                frontier_sz = self.frontier.qsize()
-            logging.debug("Frontier size = " +
-                          str(frontier_sz) +
-                          "; Explored size = " +
-                          str(len(self.explored)))
-            if self.algo == "bfs" or self.algo == "dfs":
-                break_cond = len(self.frontier) == 0
-            else:
-                break_cond = self.frontier.empty()
+                if timed:
+                    started = time.perf_counter()
+                if parents_only:
+                    duplicate = neighbor.key in self.parents
+                elif uninformed:
+                    duplicate = (neighbor.key in self.explored or
+                                 neighbor.key in self.frontier_set)
+                elif neighbor.key in self.explored:
+                    duplicate = True
+                else:
+                    # Not a duplicate when this is a cheaper path to a
+                    # state that's already on the frontier
+                    frontier_g = self.frontier.g_of(neighbor.key)
+                    duplicate = frontier_g is not None and frontier_g <= neighbor.depth
+                if timed:
+                    checked = time.perf_counter()
+                    dedupe_time = dedupe_time + checked - started
+                if duplicate:
+                    duplicates = duplicates + 1
+                    continue
+
+                if uninformed:
+                    self.frontier.append(neighbor)
+                    if not parents_only:
+                        self.frontier_set.add(neighbor.key)
+                else:
+                    self.evaluate(neighbor)
+                    evaluations = evaluations + 1
+                    self.frontier.push(neighbor)
+                pushes = pushes + 1
+                if self.compact_parents:
+                    neighbor.parent = None
+                    self.parents[neighbor.key] = MOVE_CODES[neighbor.parent_move]
+                if neighbor.depth > maxdepth:
+                    maxdepth = neighbor.depth
+                if timed:
+                    push_time = push_time + time.perf_counter() - checked
+            if not parents_only:
+                self.explored.add(current_state.key)
+            nodes_expanded = nodes_expanded + 1
+
+            if self.max_states is not None and self.states_held() > self.max_states:
+                logging.warning("Over the budget of %d states after %d expansions, "
+                                "falling back to a beam search", self.max_states,
+                                nodes_expanded)
+                return self.solve_beam(start_time, search_counters(
+                    nodes_expanded, pops, pushes, duplicates, evaluations))
+
+            if debug:
+                logging.debug("Frontier size = %d; Explored size = %d",
+                              len(self.frontier), nodes_expanded)
+            if nodes_expanded == next_progress:
+                next_progress = next_progress + self.progress_every
+                self.report_progress(start_time, len(self.frontier),
+                                     search_counters(nodes_expanded, pops, pushes,
+                                                     duplicates, evaluations))
+            break_cond = len(self.frontier) == 0
         logging.error("This is an unsolvable board!")
         return None
 
+    def states_held(self):
+        """
+        The number of states BFS/DFS/A* are keeping track of, stale entries
+        of the A* heap included
+        """
+        if isinstance(self.frontier, PriorityFrontier):
+            frontier_size = len(self.frontier.heap)
+        else:
+            frontier_size = len(self.frontier)
+        return len(self.explored) + frontier_size + len(self.parents)
+
+    def solve_beam(self, start_time, counters):
+        """
+        The fallback of a search that ran out of its state budget. The
+        search's own structures are emptied, then a beam search starts over
+        from the initial state: a layer at a time, every child not seen by
+        the beam before is evaluated, and only the beam_width with the
+        lowest h go on to the next layer. It holds about beam_width states
+        per layer of depth, and gives up (returning None) if that passes
+        max_states too, or if the beam dies out. The counters carry on from
+        the abandoned search. The path found isn't necessarily optimal, nor
+        within any bound of it, so its stats have no "suboptimality_bound"
+        """
+        self.frontier.clear()
+        self.frontier_set.clear()
+        self.explored.clear()
+        self.parents.clear()
+        nodes_expanded = counters["expansions"]
+        pops = counters["pops"]
+        pushes = counters["pushes"]
+        duplicates = counters["duplicates"]
+        evaluations = counters["heuristic_evaluations"]
+
+        layer = [self.initial_state]
+        seen = {self.initial_state.key}
+        depth = 0
+        final_state = self.initial_state if self.isFinalState(self.initial_state) else None
+        while final_state is None:
+            if not layer:
+                logging.error("The beam died out without reaching the goal")
+                return None
+            if len(seen) > self.max_states:
+                logging.error("The beam search ran out of its budget of %d states",
+                              self.max_states)
+                return None
+            children = []
+            for state in layer:
+                pops = pops + 1
+                nodes_expanded = nodes_expanded + 1
+                for neighbor in state.generate_possible_states():
+                    if neighbor.key in seen:
+                        duplicates = duplicates + 1
+                        continue
+                    seen.add(neighbor.key)
+                    self.evaluate(neighbor)
+                    evaluations = evaluations + 1
+                    children.append(neighbor)
+                    if self.isFinalState(neighbor):
+                        final_state = neighbor
+                        break
+                if final_state is not None:
+                    break
+            # Stable, so ties stay in UDLR order. Children left out of the
+            # beam are forgotten, only the kept ones stay in seen
+            children.sort(key=lambda state: state.h)
+            for child in children[self.beam_width:]:
+                seen.discard(child.key)
+            layer = children[:self.beam_width]
+            pushes = pushes + len(layer)
+            depth = depth + 1
+
+        soln = self.get_solution_moves(final_state)
+        end_time = time.time()
+        stats = {}
+        stats["nodes_expanded"] = nodes_expanded
+        stats["search_depth"] = final_state.depth
+        stats["max_search_depth"] = depth
+        stats["cost_of_path"] = len(soln)
+        stats["time"] = end_time - start_time
+        stats["path"] = soln
+        stats["counters"] = search_counters(nodes_expanded, pops, pushes,
+                                            duplicates, evaluations)
+        stats["optimal"] = False
+        stats["fallback"] = "beam"
+        return stats
+
+    def solve_ida(self):
+        """
+        Iterative deepening A*: a series of depth first searches, each one
+        cut off once f = g + h exceeds the current bound, the bound being
+        raised to the smallest f that was cut off in the previous round.
+        Only the states along the current path (plus their unexplored
+        siblings) are alive at any time, so memory is linear in the depth.
+        Returns the same stats dict as solve()
+        """
+        start_time = time.time()
+        root = self.initial_state
+        root.process_astar_stats()
+        self.evaluate(root)
+        bound = root.f
+        nodes_expanded = 0
+        maxdepth = 0
+        pops = 0
+        pushes = 0
+        duplicates = 0
+        evaluations = 1
+        next_progress = self.progress_every if self.progress else -1
+
+        while bound != math.inf:
+            next_bound = math.inf
+            stack = [root]
+            while stack:
+                current_state = stack.pop()
+                pops = pops + 1
+                if current_state.f > bound:
+                    if current_state.f < next_bound:
+                        next_bound = current_state.f
+                    continue
+                if current_state.depth > maxdepth:
+                    maxdepth = current_state.depth
+                if (self.isFinalState(current_state)):
+                    soln = self.get_solution_moves(current_state)
+                    end_time = time.time()
+                    stats = {}
+                    stats["nodes_expanded"] = nodes_expanded
+                    stats["search_depth"] = current_state.depth
+                    stats["max_search_depth"] = maxdepth
+                    stats["cost_of_path"] = len(soln)
+                    stats["time"] = end_time - start_time
+                    stats["path"] = soln
+                    stats["counters"] = search_counters(nodes_expanded, pops, pushes,
+                                                        duplicates, evaluations)
+                    return stats
+                nodes_expanded = nodes_expanded + 1
+                # The move undoing the one that got us here isn't generated
+                if current_state.parent_move is not None:
+                    duplicates = duplicates + 1
+                neighbors = current_state.generate_possible_states()
+                # Pushed in reverse so that they're popped in UDLR order
+                for neighbor in reversed(neighbors):
+                    self.evaluate(neighbor)
+                    stack.append(neighbor)
+                    pushes = pushes + 1
+                    evaluations = evaluations + 1
+                if nodes_expanded == next_progress:
+                    next_progress = next_progress + self.progress_every
+                    self.report_progress(start_time, len(stack),
+                                         search_counters(nodes_expanded, pops, pushes,
+                                                         duplicates, evaluations))
+            logging.debug("IDA* bound %d exhausted, next bound %s",
+                          bound, next_bound)
+            bound = next_bound
+        logging.error("This is an unsolvable board!")
+        return None
+
+    def solve_anytime(self, time_budget=None):
+        """
+        Anytime repairing A* (ARA*). A first path comes quickly from an A*
+        search weighted by self.weight, then the weight is lowered by
+        weight_step and the search goes on to improve on it, until the
+        weight is down to 1 (the path is then optimal) or time_budget runs
+        out. Searches after the first reuse the work of the earlier ones:
+        the frontier is kept and only reordered for the new weight, and
+        explored states whose g went down since they were expanded are put
+        back on it, rather than starting over. Each path is at most
+        suboptimality_bound times longer than the optimal one, the bound
+        being the smaller of the weight and the path's cost over the lowest
+        g + h left on the frontier. The first path is always searched for,
+        however long it takes, time_budget only cuts the improvements
+        short. Returns the stats of the best path found
+        """
+        start_time = time.time()
+        deadline = math.inf if time_budget is None else start_time + time_budget
+        final_key = goal_key(self.initial_state.dimensions)
+        weight = self.weight
+        # Best g found so far for every state seen, and the states explored
+        # since the weight last changed. inconsistent holds the explored
+        # states that have been reached more cheaply since
+        best_g = {self.initial_state.key: 0}
+        closed = self.explored
+        inconsistent = {}
+        best = None
+        bound = math.inf
+        iterations = 0
+        nodes_expanded = 0
+        maxdepth = 0
+        pops = 0
+        pushes = 0
+        duplicates = 0
+        evaluations = 1
+        next_progress = self.progress_every if self.progress else -1
+
+        while True:
+            # One pass of weighted A*, until nothing on the frontier could
+            # lead to a better path than the best one
+            goal_g = best.depth if best is not None else math.inf
+            timed_out = False
+            while len(self.frontier) and self.frontier.min_f() < goal_g:
+                if best is not None and time.time() > deadline:
+                    timed_out = True
+                    break
+                current_state = self.frontier.pop()
+                pops = pops + 1
+                if current_state.key == final_key:
+                    best = current_state
+                    goal_g = current_state.depth
+                    continue
+                closed.add(current_state.key)
+                nodes_expanded = nodes_expanded + 1
+                for neighbor in current_state.generate_possible_states():
+                    if best_g.get(neighbor.key, math.inf) <= neighbor.depth:
+                        duplicates = duplicates + 1
+                        continue
+                    best_g[neighbor.key] = neighbor.depth
+                    self.evaluate(neighbor, weight)
+                    evaluations = evaluations + 1
+                    if neighbor.key in closed:
+                        inconsistent[neighbor.key] = neighbor
+                    else:
+                        self.frontier.push(neighbor)
+                        pushes = pushes + 1
+                        if neighbor.depth > maxdepth:
+                            maxdepth = neighbor.depth
+                if nodes_expanded == next_progress:
+                    next_progress = next_progress + self.progress_every
+                    self.report_progress(start_time, len(self.frontier),
+                                         search_counters(nodes_expanded, pops, pushes,
+                                                         duplicates, evaluations))
+            if best is None:
+                logging.error("This is an unsolvable board!")
+                return None
+
+            # The best path can't beat the lowest g + h left unexplored
+            lowest = min([state.depth + state.h for state in inconsistent.values()] +
+                         [entry[3].depth + entry[3].h for entry in self.frontier.heap
+                          if self.frontier.g_of(entry[3].key) == entry[3].depth],
+                         default=math.inf)
+            bound = min(bound, max(1, best.depth / lowest) if lowest else 1)
+            if not timed_out:
+                # A finished pass of weighted A* is within its weight
+                bound = min(bound, weight)
+            iterations = iterations + 1
+            logging.debug("ARA* weight %s: path of %d moves, within %s of optimal",
+                          weight, best.depth, bound)
+            if timed_out or bound <= 1 or time.time() > deadline:
+                break
+
+            # Lower the weight and carry on from where the last pass stopped
+            weight = max(1, weight - self.weight_step)
+            for key, state in inconsistent.items():
+                self.frontier.push(state)
+                pushes = pushes + 1
+            inconsistent.clear()
+            self.frontier.reweigh(weight)
+            closed.clear()
+
+        soln = self.get_solution_moves(best)
+        end_time = time.time()
+        stats = {}
+        stats["nodes_expanded"] = nodes_expanded
+        stats["search_depth"] = best.depth
+        stats["max_search_depth"] = maxdepth
+        stats["cost_of_path"] = len(soln)
+        stats["time"] = end_time - start_time
+        stats["path"] = soln
+        stats["counters"] = search_counters(nodes_expanded, pops, pushes,
+                                            duplicates, evaluations)
+        stats["optimal"] = bound <= 1
+        stats["suboptimality_bound"] = bound
+        stats["iterations"] = iterations
+        return stats
+
+    def solve_descent(self):
+        """
+        Solves a board without any search, by greedy descent on an exact
+        heuristic: from every state, the first child (in UDLR order) that's
+        one move nearer the goal is taken, until the goal is reached. Unless
+        the solver was given a heuristic, the 8-puzzle distance table is
+        used, built the first time it's needed. Boards of any other size
+        are rejected with a ValueError before it's opened. Returns the same
+        stats dict as solve()
+        """
+        start_time = time.time()
+        if self.heuristic is None:
+            from distancetable import DistanceTable, table_dimensions
+            dimensions = table_dimensions()
+            if self.initial_state.dimensions != dimensions:
+                raise ValueError("The distance table is for %dx%d boards" %
+                                 (dimensions, dimensions))
+            self.heuristic = DistanceTable.open()
+        current_state = self.initial_state
+        distance = self.heuristic(current_state)
+        nodes_expanded = 0
+        evaluations = 1
+        while distance > 0:
+            nodes_expanded = nodes_expanded + 1
+            for neighbor in current_state.generate_possible_states():
+                evaluations = evaluations + 1
+                if self.heuristic(neighbor) == distance - 1:
+                    break
+            else:
+                raise ValueError("The heuristic isn't an exact distance to the goal")
+            current_state = neighbor
+            distance = distance - 1
+
+        soln = self.get_solution_moves(current_state)
+        end_time = time.time()
+        stats = {}
+        stats["nodes_expanded"] = nodes_expanded
+        stats["search_depth"] = current_state.depth
+        stats["max_search_depth"] = current_state.depth
+        stats["cost_of_path"] = len(soln)
+        stats["time"] = end_time - start_time
+        stats["path"] = soln
+        stats["counters"] = search_counters(nodes_expanded, nodes_expanded,
+                                            nodes_expanded, 0, evaluations)
+        return stats
+
+    def solve_bibfs(self):
+        """
+        Bidirectional breadth first search: one BFS from the initial state
+        and one from the goal, growing whichever side has the smaller layer
+        by a whole layer at a time, until the two meet. Each side only goes
+        about half the solution depth, so far fewer states are generated
+        than by a single BFS. Returns the same stats dict as solve()
+        """
+        start_time = time.time()
+        initial = self.initial_state
+        goal = goal_state(initial.dimensions)
+        # Index 0 is the forward side (from the initial state), 1 the
+        # backward side (from the goal)
+        seen = ({initial.key: initial}, {goal.key: goal})
+        layers = [[initial], [goal]]
+        nodes_expanded = 0
+        maxdepth = 0
+        duplicates = 0
+        pushes = 0
+        next_progress = self.progress_every if self.progress else -1
+        meeting = (initial, goal) if initial.key == goal.key else None
+
+        while meeting is None and layers[0] and layers[1]:
+            side = 0 if len(layers[0]) <= len(layers[1]) else 1
+            own = seen[side]
+            other = seen[1 - side]
+            next_layer = []
+            best = math.inf
+            for current_state in layers[side]:
+                nodes_expanded = nodes_expanded + 1
+                for neighbor in current_state.generate_possible_states():
+                    if neighbor.key in own:
+                        duplicates = duplicates + 1
+                        continue
+                    own[neighbor.key] = neighbor
+                    next_layer.append(neighbor)
+                    pushes = pushes + 1
+                    match = other.get(neighbor.key)
+                    # The whole layer is finished before stopping, as the
+                    # first meeting in it isn't necessarily the shortest
+                    if match is not None and neighbor.depth + match.depth < best:
+                        best = neighbor.depth + match.depth
+                        meeting = (neighbor, match) if side == 0 else (match, neighbor)
+                if nodes_expanded == next_progress:
+                    next_progress = next_progress + self.progress_every
+                    self.report_progress(start_time, len(layers[1 - side]) + len(next_layer),
+                                         search_counters(nodes_expanded, nodes_expanded,
+                                                         pushes, duplicates, 0))
+            if next_layer and next_layer[0].depth > maxdepth:
+                maxdepth = next_layer[0].depth
+            layers[side] = next_layer
+            logging.debug("Layer sizes = %d forward, %d backward",
+                          len(layers[0]), len(layers[1]))
+
+        if meeting is None:
+            logging.error("This is an unsolvable board!")
+            return None
+        return self.bidirectional_stats(meeting, maxdepth, start_time,
+                                        search_counters(nodes_expanded, nodes_expanded,
+                                                        pushes, duplicates, 0))
+
+    def solve_biastar(self):
+        """
+        Front-to-end bidirectional A*. The forward search is guided by the
+        solver's heuristic towards the goal, the backward search by the
+        manhattan score towards the initial state. The side with the smaller
+        frontier is expanded, and search stops once the best meeting found
+        costs no more than the larger of the two smallest f values on the
+        frontiers, which keeps the solution optimal. Returns the same stats
+        dict as solve()
+        """
+        start_time = time.time()
+        initial = self.initial_state
+        dimensions = initial.dimensions
+        bits = tile_bits(dimensions)
+        mask = (1 << bits) - 1
+        goal = goal_state(dimensions)
+
+        # to_initial[tile][index] is the manhattan distance of tile, when
+        # sitting at index, from where it is in the initial state
+        initial_tiles = initial.tiles
+        to_initial = [None] * len(initial_tiles)
+        for position, tile in enumerate(initial_tiles):
+            row, col = position // dimensions, position % dimensions
+            to_initial[tile] = [0 if tile == 0 else
+                                abs(i // dimensions - row) + abs(i % dimensions - col)
+                                for i in range(len(initial_tiles))]
+        self.evaluate(initial)
+        goal.h = sum(to_initial[tile][tile] for tile in range(len(initial_tiles)))
+        goal.f = goal.h
+
+        # Index 0 is the forward side (from the initial state), 1 the
+        # backward side (from the goal). seen holds the best state found
+        # so far for every key, open or closed
+        frontiers = (PriorityFrontier(), PriorityFrontier())
+        frontiers[0].push(initial)
+        frontiers[1].push(goal)
+        seen = ({initial.key: initial}, {goal.key: goal})
+        closed = (set(), set())
+        nodes_expanded = 0
+        maxdepth = 0
+        pushes = 0
+        duplicates = 0
+        evaluations = 2
+        next_progress = self.progress_every if self.progress else -1
+        best = math.inf
+        meeting = None
+        if initial.key == goal.key:
+            best = 0
+            meeting = (initial, goal)
+
+        while frontiers[0] and frontiers[1]:
+            if best <= max(frontiers[0].min_f(), frontiers[1].min_f()):
+                break
+            side = 0 if len(frontiers[0]) <= len(frontiers[1]) else 1
+            current_state = frontiers[side].pop()
+            closed[side].add(current_state.key)
+            nodes_expanded = nodes_expanded + 1
+            for neighbor in current_state.generate_possible_states():
+                if neighbor.key in closed[side]:
+                    duplicates = duplicates + 1
+                    continue
+                known = seen[side].get(neighbor.key)
+                if known is not None and known.depth <= neighbor.depth:
+                    duplicates = duplicates + 1
+                    continue
+                evaluations = evaluations + 1
+                if side == 0:
+                    self.evaluate(neighbor)
+                else:
+                    # The tile that moved now sits where the blank was
+                    tile = (neighbor.key >> (current_state.empty_index * bits)) & mask
+                    distances = to_initial[tile]
+                    neighbor.h = (current_state.h +
+                                  distances[current_state.empty_index] -
+                                  distances[neighbor.empty_index])
+                    neighbor.f = neighbor.depth + neighbor.h
+                seen[side][neighbor.key] = neighbor
+                frontiers[side].push(neighbor)
+                pushes = pushes + 1
+                if neighbor.depth > maxdepth:
+                    maxdepth = neighbor.depth
+                match = seen[1 - side].get(neighbor.key)
+                if match is not None and neighbor.depth + match.depth < best:
+                    best = neighbor.depth + match.depth
+                    meeting = (neighbor, match) if side == 0 else (match, neighbor)
+            if nodes_expanded == next_progress:
+                next_progress = next_progress + self.progress_every
+                self.report_progress(start_time, len(frontiers[0]) + len(frontiers[1]),
+                                     search_counters(nodes_expanded, nodes_expanded,
+                                                     pushes, duplicates, evaluations))
+
+        if meeting is None:
+            logging.error("This is an unsolvable board!")
+            return None
+        return self.bidirectional_stats(meeting, maxdepth, start_time,
+                                        search_counters(nodes_expanded, nodes_expanded,
+                                                        pushes, duplicates, evaluations))
+
+    def bidirectional_stats(self, meeting, maxdepth, start_time, counters):
+        """
+        Builds the stats dict for a bidirectional search. meeting is the
+        pair of states, forward and backward, on which the searches met.
+        The moves on the backward side were made from the goal, so they
+        are undone in reverse to continue the forward path to the goal
+        """
+        forward_state, backward_state = meeting
+        soln = self.get_solution_moves(forward_state)
+        current_state = backward_state
+        while current_state.parent_move is not None:
+            soln.append(OPPOSITE_MOVES[current_state.parent_move])
+            current_state = current_state.parent
+        end_time = time.time()
+        stats = {}
+        stats["nodes_expanded"] = counters["expansions"]
+        stats["search_depth"] = len(soln)
+        stats["max_search_depth"] = maxdepth
+        stats["cost_of_path"] = len(soln)
+        stats["time"] = end_time - start_time
+        stats["path"] = soln
+        stats["counters"] = counters
+        return stats
+
+    def report_progress(self, start_time, frontier_size, counters):
+        """
+        Hands a snapshot of a running search's counters to the progress hook
+        """
+        counters["algo"] = self.algo
+        counters["frontier_size"] = frontier_size
+        counters["elapsed"] = time.time() - start_time
+        self.progress(counters)
+
+    def evaluate(self, state, weight=None):
+        """
+        Replaces the manhattan based h of a state with the one given by the
+        solver's heuristic, if it has one, and sets its f to g + weight * h,
+        the solver's weight unless another is given
+        """
+        if self.heuristic is not None:
+            state.h = self.heuristic(state)
+        state.f = state.depth + (self.weight if weight is None else weight) * state.h
+
     def get_solution_moves(self, final_state):
         """
         Gets the sequence of moves from parent to this state
@@ -307,48 +1472,220 @@ class NPuzzleSolver:
         [res.append(move) for move in moves]
         return res
 
+    def get_compact_solution_moves(self, final_state):
+        """
+        Gets the sequence of moves from the initial state to final_state
+        from the parents dict kept with compact_parents. Each step undoes
+        the recorded move on the packed key to get the parent's key
+        """
+        dimensions = final_state.dimensions
+        moves = []
+        key = final_state.key
+        empty_index = final_state.empty_index
+        initial_key = self.initial_state.key
+        while key != initial_key:
+            code = self.parents[key]
+            moves.append(MOVES[code])
+            key, empty_index = undo_move(key, empty_index, code, dimensions)
+        moves.reverse()
+        return moves
+
     def isFinalState(self, state):
         """
-        Checks if this is the final state (0,1,2...m^2-1)
+        Checks if this is the final state (0,1,2...m^2-1), by comparing
+        packed keys
         """
-        internal_state = state.tiles
-        for i in range(len(internal_state) - 1):
-            if internal_state[i] != i:
-                return False
-        return True
+        return state.key == goal_key(state.dimensions)
 
 
 if __name__ == '__main__':
     logging.basicConfig(level=logging.INFO,
                         format='%(asctime)s - %(levelname)s - %(message)s')
-    arguments = sys.argv
-    initial_board_state = State([int(x) for x in str(arguments[2]).split(",")])
-    logging.debug("MD of initial state = %d", initial_board_state.compute_manhattan())
-    if arguments[1] == "bfs":
-        solver = NPuzzleSolver("bfs", initial_board_state)
-    elif arguments[1] == "dfs":
-        solver = NPuzzleSolver("dfs", initial_board_state)
-    elif arguments[1] == "ast":
-        solver = NPuzzleSolver("ast", initial_board_state)
-    stats = solver.solve()
-    ram_usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
-    print(
-        "path_to_goal: " + str(stats["path"]) +
-        "\ncost_of_path: " + str(stats["cost_of_path"]) +
-        "\nnodes_expanded: " + str(stats["nodes_expanded"]) +
-        "\nsearch_depth: " + str(stats["search_depth"]) +
-        "\nmax_search_depth: " + str(stats["max_search_depth"]) +
-        "\nrunning_time: " + str(stats["time"]) +
-        "\nmax_ram_usage: " + str(ram_usage)
-    )
-    op = open("output.txt", "w+")
-    op.write(
-        "path_to_goal: " + str(stats["path"]) +
-        "\ncost_of_path: " + str(stats["cost_of_path"]) +
-        "\nnodes_expanded: " + str(stats["nodes_expanded"]) +
-        "\nsearch_depth: " + str(stats["search_depth"]) +
-        "\nmax_search_depth: " + str(stats["max_search_depth"]) +
-        "\nrunning_time: " + str(stats["time"]) +
-        "\nmax_ram_usage: " + str(ram_usage)
-    )
-    op.close()
+    parser = argparse.ArgumentParser(description="Solves n-puzzle boards")
+    parser.add_argument("method", choices=ALGORITHMS)
+    parser.add_argument("board", nargs="+",
+                        help="comma separated tiles, e.g. 1,2,5,3,4,0,6,7,8; "
+                             "several boards are solved one after the other")
+    parser.add_argument("--format", choices=["text", "jsonl", "binary"], default="text",
+                        help="text (the default) prints the stats and writes them "
+                             "to output.txt, jsonl writes a JSON line per board and "
+                             "binary a status, length and 2 bit moves per board")
+    parser.add_argument("--output", default=None, metavar="FILE",
+                        help="file to write results to, - for stdout; output.txt "
+                             "for text and stdout otherwise by default")
+    parser.add_argument("--pdb", default=None,
+                        help="pattern database file (see patterndb.py) to use "
+                             "as the heuristic for ast/ida")
+    parser.add_argument("--table", default=None,
+                        help="exact distance table file (see distancetable.py) "
+                             "to use for table, built if it doesn't exist yet")
+    parser.add_argument("--compact-parents", action="store_true",
+                        help="keep parent links in a dict of packed keys rather "
+                             "than on states, for lower memory in bfs/dfs/ast")
+    parser.add_argument("--progress", type=int, default=0, metavar="N",
+                        help="log the search counters every N expansions")
+    parser.add_argument("--cache", default=None, metavar="FILE",
+                        help="sqlite file of solved boards to answer from, and "
+                             "to add this board to once solved")
+    parser.add_argument("--cache-size", type=int, default=None, metavar="N",
+                        help="most boards kept in the cache, least recently used "
+                             "go first")
+    parser.add_argument("--max-states", type=int, default=None, metavar="N",
+                        help="most states bfs/dfs/ast may hold before falling "
+                             "back to a beam search")
+    parser.add_argument("--beam-width", type=int, default=1000, metavar="W",
+                        help="states kept per layer by the beam search fallback")
+    parser.add_argument("--weight", type=float, default=None, metavar="W",
+                        help="weight on h for ast (f = g + W*h, 1 by default), "
+                             "or the starting weight for ara (%d by default)" % ARA_WEIGHT)
+    parser.add_argument("--budget", type=float, default=None, metavar="SECONDS",
+                        help="how long ara may spend improving its first path")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="processes hda searches with, all cores by default")
+    parser.add_argument("--disk", default=None, metavar="DIR",
+                        help="directory bfs keeps its layers in, on disk rather "
+                             "than in memory; an interrupted run there resumes")
+    arguments = parser.parse_args(sys.argv[1:])
+    if arguments.weight is not None:
+        if arguments.weight != 1 and arguments.method not in ("ast", "ara"):
+            parser.error("only ast and ara take a --weight")
+        if arguments.weight < 1:
+            parser.error("--weight can't be below 1")
+    if arguments.method == "vbfs":
+        # NumPy is only needed for vbfs, and isn't otherwise required
+        try:
+            import vectorbfs
+        except ImportError:
+            parser.error("vbfs needs numpy")
+    try:
+        boards = [parse_board(board) for board in arguments.board]
+        # Boards the method or heuristic can't take at all are turned away
+        # before any distance table is opened or built
+        if arguments.pdb is None and (arguments.table is not None or
+                                      arguments.method == "table"):
+            from distancetable import DEFAULT_PATH, table_dimensions
+            dimensions = table_dimensions(arguments.table or DEFAULT_PATH)
+            for tiles in boards:
+                if len(tiles) != dimensions * dimensions:
+                    raise ValueError("The distance table is for %dx%d boards" %
+                                     (dimensions, dimensions))
+        if arguments.method == "vbfs":
+            for tiles in boards:
+                if len(tiles) > vectorbfs.MAX_TILES:
+                    raise ValueError("Layered BFS supports boards of up to %d tiles"
+                                     % vectorbfs.MAX_TILES)
+        heuristic = None
+        if arguments.pdb is not None:
+            from patterndb import PatternDatabase
+            heuristic = PatternDatabase(arguments.pdb)
+        elif arguments.table is not None:
+            from distancetable import DistanceTable
+            heuristic = DistanceTable.open(arguments.table)
+        if heuristic is not None:
+            for tiles in boards:
+                check_heuristic(heuristic, tiles)
+    except ValueError as e:
+        logging.error("%s", e)
+        sys.exit(1)
+    solver = NPuzzleSolver(arguments.method, None, heuristic,
+                           arguments.compact_parents,
+                           progress=(lambda counters: logging.info("%s", counters))
+                           if arguments.progress else None,
+                           progress_every=arguments.progress,
+                           max_states=arguments.max_states,
+                           beam_width=arguments.beam_width,
+                           weight=arguments.weight,
+                           workers=arguments.workers,
+                           work_dir=arguments.disk)
+    cache = None
+    if arguments.cache is not None:
+        from solutioncache import DEFAULT_CAPACITY, SolutionCache
+        cache = SolutionCache(arguments.cache, arguments.cache_size or DEFAULT_CAPACITY)
+
+    output = arguments.output
+    if output is None:
+        output = "output.txt" if arguments.format == "text" else "-"
+    # Results go out through one buffered binary stream, flushed as each
+    # board is done. A file is only created once there's something to write
+    out = sys.stdout.buffer if output == "-" else None
+
+    failed = False
+    written_text = False
+    for number, board in enumerate(arguments.board):
+        initial_board_state = State(boards[number])
+        logging.debug("MD of initial state = %d", initial_board_state.compute_manhattan())
+        stats = None
+        if cache is not None:
+            stats = cache.lookup(arguments.method, initial_board_state)
+        if stats is None:
+            # Several boards can't share one disk BFS directory, so each
+            # gets its own under it
+            if arguments.disk is not None and len(boards) > 1:
+                solver.work_dir = os.path.join(arguments.disk,
+                                               "-".join(map(str, boards[number])))
+            solver.reset(initial_board_state)
+            stats = solver.solve(arguments.budget)
+            if stats is not None:
+                stats["cached"] = False
+                if cache is not None:
+                    cache.store(arguments.method, initial_board_state, stats)
+        ram_usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # No stats when a memory bounded search gives up
+        solved = stats is not None and stats["solvable"]
+        failed = failed or not solved
+        if out is None and (solved or arguments.format != "text"):
+            out = open(output, "wb", buffering=OUTPUT_BUFFER)
+
+        if arguments.format == "jsonl":
+            record = {"board": board, "method": arguments.method}
+            if stats is None:
+                record["status"] = "error"
+                record["error"] = "out of the state budget"
+            elif not stats["solvable"]:
+                record["status"] = "unsolvable"
+            else:
+                record["status"] = "solved"
+                record.update(stats_record(stats))
+                record["max_ram_usage"] = ram_usage
+            out.write(json.dumps(record).encode() + b"\n")
+        elif arguments.format == "binary":
+            if solved:
+                out.write(BINARY_RESULT.pack(SOLVED, len(stats["path"])))
+                out.write(encode_moves(stats["path"]))
+            else:
+                out.write(BINARY_RESULT.pack(UNSOLVED if stats is None else UNSOLVABLE, 0))
+        elif solved:
+            lines = [
+                "path_to_goal: " + str(stats["path"]),
+                "cost_of_path: " + str(stats["cost_of_path"]),
+                "nodes_expanded: " + str(stats["nodes_expanded"]),
+                "search_depth: " + str(stats["search_depth"]),
+                "max_search_depth: " + str(stats["max_search_depth"]),
+                "running_time: " + str(stats["time"]),
+                "max_ram_usage: " + str(ram_usage),
+            ]
+            if cache is not None:
+                lines.append("cached: " + str(stats["cached"]))
+            if arguments.max_states:
+                lines.append("optimal: " + str(stats["optimal"]))
+            if "suboptimality_bound" in stats and (arguments.weight or
+                                                   arguments.method == "ara"):
+                lines.append("suboptimality_bound: " + str(stats["suboptimality_bound"]))
+            # Blocks are separated by a blank line, and the output ends
+            # with a newline
+            text = "\n".join(lines)
+            if out is not sys.stdout.buffer:
+                print(text)
+            if written_text:
+                text = "\n" + text
+            out.write(text.encode() + b"\n")
+            written_text = True
+        if out is not None:
+            out.flush()
+
+    if cache is not None:
+        cache.close()
+    if out is not None and out is not sys.stdout.buffer:
+        out.close()
+    if failed:
+        sys.exit(1)
@@ -0,0 +1,191 @@
+import sys
+import mmap
+import struct
+import logging
+import argparse
+from collections import deque as dq
+
+from npuzzle import move_code_table, tile_bits
+
+# File layout (all little endian):
+#   header:  magic (4s), version (B), dimensions (B), number of groups (B)
+#   groups:  for every group, its size k (B) followed by its k tiles (B each)
+#   tables:  for every group, in the same order, dimensions^(2k) bytes
+# Entry i of a table is the cost for the group's tiles to reach their goal
+# positions, i being sum(position of tile_j * board_size^j)
+MAGIC = b"NPDB"
+VERSION = 1
+HEADER = struct.Struct("<4sBBB")
+
+# Marks a table entry that has not been reached (yet)
+UNSEEN = 255
+
+# Disjoint groups used when none are given: 4-4 for the 8-puzzle and
+# 6-6-3 for the 15-puzzle
+DEFAULT_GROUPS = {
+    3: ((1, 2, 3, 4), (5, 6, 7, 8)),
+    4: ((1, 2, 3, 5, 6, 7), (4, 8, 9, 12, 13, 14), (10, 11, 15)),
+}
+
+
+def build_table(dimensions, group):
+    """
+    Builds the table for one group of tiles with a retrograde breadth first
+    search from the goal over abstract states (positions of the group's
+    tiles plus the blank). Only moves of the group's own tiles cost
+    anything, which is what makes tables of disjoint groups additive.
+    Costs are 0 or 1, so this is a 0-1 BFS over a deque
+    """
+    size = dimensions * dimensions
+    k = len(group)
+    radix = [size ** i for i in range(k)]
+    blank_radix = size ** k
+    adjacent = [[cell for cell, _ in moves] for moves in move_code_table(dimensions)]
+
+    table = bytearray([UNSEEN]) * blank_radix
+    dist = bytearray([UNSEEN]) * (blank_radix * size)
+    start = sum(tile * radix[i] for i, tile in enumerate(group))
+    dist[start] = 0
+    queue = dq([start])
+    filled = 0
+
+    while queue:
+        code = queue.popleft()
+        cost = dist[code]
+        pattern = code % blank_radix
+        blank = code // blank_radix
+        # Pops come out in non decreasing cost, so the first pop of a
+        # pattern (with the blank anywhere) is its cost
+        if table[pattern] == UNSEEN:
+            table[pattern] = cost
+            filled = filled + 1
+        positions = [(pattern // radix[i]) % size for i in range(k)]
+        for cell in adjacent[blank]:
+            if cell in positions:
+                j = positions.index(cell)
+                new_code = pattern + (blank - cell) * radix[j] + cell * blank_radix
+                if cost + 1 < dist[new_code]:
+                    dist[new_code] = cost + 1
+                    queue.append(new_code)
+            else:
+                new_code = pattern + cell * blank_radix
+                if cost < dist[new_code]:
+                    dist[new_code] = cost
+                    queue.appendleft(new_code)
+    logging.info("Pattern %s: %d entries, max cost %d",
+                 group, filled, max(c for c in table if c != UNSEEN))
+    return table
+
+
+def build_database(path, dimensions, groups=None):
+    """
+    Builds the tables for every group and writes them out to path.
+    Groups must be disjoint and must not contain the blank (0)
+    """
+    if groups is None:
+        groups = DEFAULT_GROUPS[dimensions]
+    tiles = [tile for group in groups for tile in group]
+    if 0 in tiles or len(set(tiles)) != len(tiles):
+        raise ValueError("Groups must be disjoint and must not contain 0")
+    if not all(0 < tile < dimensions * dimensions for tile in tiles):
+        raise ValueError("Groups contain tiles not on the board")
+
+    with open(path, "wb") as out:
+        out.write(HEADER.pack(MAGIC, VERSION, dimensions, len(groups)))
+        for group in groups:
+            out.write(bytes([len(group)] + list(group)))
+        for group in groups:
+            out.write(build_table(dimensions, group))
+
+
+class PatternDatabase:
+    """
+    An additive pattern database heuristic loaded from a file written by
+    build_database. The tables are memory mapped read only, so loading is
+    immediate and several solver processes using the same file share the
+    pages. Instances are callables taking a State, so they can be handed
+    straight to NPuzzleSolver as its heuristic
+    """
+
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            self.mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, dimensions, count = HEADER.unpack_from(self.mm, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(path + " is not a pattern database")
+        self.dimensions = dimensions
+        size = dimensions * dimensions
+
+        offset = HEADER.size
+        self.groups = []
+        for _ in range(count):
+            k = self.mm[offset]
+            self.groups.append(tuple(self.mm[offset + 1:offset + 1 + k]))
+            offset = offset + 1 + k
+
+        view = memoryview(self.mm)
+        self.tables = []
+        for group in self.groups:
+            length = size ** len(group)
+            self.tables.append(view[offset:offset + length])
+            offset = offset + length
+        if offset != len(self.mm):
+            raise ValueError(path + " is truncated or corrupt")
+
+        # Per group, the weight of each of its tiles' positions in the index
+        self.radices = [[size ** i for i in range(len(group))]
+                        for group in self.groups]
+
+    def __call__(self, state):
+        """
+        The heuristic value of a state: the sum of the costs looked up in
+        every group's table
+        """
+        if state.dimensions != self.dimensions:
+            raise ValueError("Pattern database is for %dx%d boards" %
+                             (self.dimensions, self.dimensions))
+        bits = tile_bits(self.dimensions)
+        mask = (1 << bits) - 1
+        key = state.key
+        positions = [0] * (self.dimensions * self.dimensions)
+        for i in range(len(positions)):
+            positions[(key >> (i * bits)) & mask] = i
+
+        h = 0
+        for group, radix, table in zip(self.groups, self.radices, self.tables):
+            index = 0
+            for tile, weight in zip(group, radix):
+                index = index + positions[tile] * weight
+            h = h + table[index]
+        return h
+
+    def close(self):
+        """
+        Unmaps the tables. The instance can't be used afterwards
+        """
+        for table in self.tables:
+            table.release()
+        self.tables = []
+        self.mm.close()
+
+
+def parse_groups(text):
+    """
+    Parses groups written as 1,2,3/4,5,6 into tuples of tiles
+    """
+    return tuple(tuple(int(x) for x in group.split(","))
+                 for group in text.split("/"))
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO,
+                        format='%(asctime)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(
+        description="Builds an additive pattern database for the n-puzzle")
+    parser.add_argument("dimensions", type=int,
+                        help="width of the board, e.g. 4 for the 15-puzzle")
+    parser.add_argument("output", help="file to write the database to")
+    parser.add_argument("--groups", type=parse_groups, default=None,
+                        help="disjoint tile groups, e.g. 1,2,3,4/5,6,7,8")
+    args = parser.parse_args(sys.argv[1:])
+    build_database(args.output, args.dimensions, args.groups)
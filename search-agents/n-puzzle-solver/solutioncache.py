@@ -0,0 +1,144 @@
+import time
+import sqlite3
+
+from npuzzle import MOVES, pack_tiles, search_counters, tile_bits
+
+# Entries kept when no size is given
+DEFAULT_CAPACITY = 100000
+
+# Paths are stored as one letter per move, in MOVES order
+MOVE_LETTERS = "UDLR"
+
+# Transposing a board about its main diagonal keeps the goal where it is
+# and turns moves of the blank along rows into moves along columns
+TRANSPOSED_MOVES = {"Up": "Left", "Down": "Right", "Left": "Up", "Right": "Down"}
+
+# Methods whose path depends on the order moves are tried in (UDLR), so
+# the transpose of a board's path isn't the path they'd find for the
+# transposed board. Their boards are cached as they are
+ORDERED_METHODS = ("bfs", "dfs", "bibfs", "vbfs", "table")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS solutions (
+    method TEXT NOT NULL,
+    dimensions INTEGER NOT NULL,
+    board TEXT NOT NULL,
+    path TEXT NOT NULL,
+    max_depth INTEGER NOT NULL,
+    used REAL NOT NULL,
+    PRIMARY KEY (method, dimensions, board)
+)
+"""
+
+
+def transpose(tiles):
+    """
+    The board reflected about its main diagonal: the tile at (row, col) goes
+    to (col, row), and is relabelled as the tile whose goal cell is the
+    transpose of its own. The goal (and the blank's goal cell) map to
+    themselves, so a board and its transpose are equally far from the goal
+    """
+    dimensions = int(len(tiles) ** 0.5)
+    transposed = [0] * len(tiles)
+    for i, tile in enumerate(tiles):
+        row, col = i // dimensions, i % dimensions
+        tile_row, tile_col = tile // dimensions, tile % dimensions
+        transposed[col * dimensions + row] = tile_col * dimensions + tile_row
+    return transposed
+
+
+def canonical_board(tiles, symmetric=True):
+    """
+    The packed key under which a board is cached, the smaller of the keys of
+    the board and its transpose, and whether the transpose was picked. With
+    symmetric False, it's always the board's own key
+    """
+    bits = tile_bits(int(len(tiles) ** 0.5))
+    key = pack_tiles(tiles, bits)
+    if not symmetric:
+        return key, False
+    transposed_key = pack_tiles(transpose(tiles), bits)
+    if transposed_key < key:
+        return transposed_key, True
+    return key, False
+
+
+class SolutionCache:
+    """
+    A persistent cache of solved boards, per method, in a sqlite file so it
+    survives across processes and can be shared by several at once. A board
+    and its transpose share one entry, the path being remapped on the way
+    in and out, except for the methods of ORDERED_METHODS. The least
+    recently used entries are evicted once there are more than capacity of
+    them
+    """
+
+    def __init__(self, path, capacity=DEFAULT_CAPACITY):
+        self.capacity = capacity
+        self.db = sqlite3.connect(path, timeout=30)
+        # A cache written before max_depth was kept is just dropped
+        columns = [row[1] for row in self.db.execute("PRAGMA table_info(solutions)")]
+        if columns and "max_depth" not in columns:
+            self.db.execute("DROP TABLE solutions")
+        self.db.execute(SCHEMA)
+        self.db.execute("CREATE INDEX IF NOT EXISTS solutions_used ON solutions (used)")
+        self.db.commit()
+
+    def lookup(self, method, state):
+        """
+        The stats dict for a board solved earlier by method, or None. Nothing
+        is searched, so nodes_expanded and the counters are zero, and
+        "cached" is set
+        """
+        start_time = time.time()
+        key, transposed = canonical_board(state.tiles, method not in ORDERED_METHODS)
+        row = self.db.execute(
+            "SELECT path, max_depth FROM solutions WHERE method = ? AND dimensions = ? AND board = ?",
+            (method, state.dimensions, str(key))).fetchone()
+        if row is None:
+            return None
+        self.db.execute(
+            "UPDATE solutions SET used = ? WHERE method = ? AND dimensions = ? AND board = ?",
+            (time.time(), method, state.dimensions, str(key)))
+        self.db.commit()
+
+        path = [MOVES[MOVE_LETTERS.index(letter)] for letter in row[0]]
+        if transposed:
+            path = [TRANSPOSED_MOVES[move] for move in path]
+        stats = {}
+        stats["nodes_expanded"] = 0
+        stats["search_depth"] = len(path)
+        stats["max_search_depth"] = row[1]
+        stats["cost_of_path"] = len(path)
+        stats["time"] = time.time() - start_time
+        stats["path"] = path
+        stats["counters"] = search_counters(0, 0, 0, 0, 0)
+        stats["solvable"] = True
+        stats["optimal"] = method != "dfs"
+        stats["cached"] = True
+        return stats
+
+    def store(self, method, state, stats):
+        """
+        Caches the path of a solved board, then evicts the least recently
+        used entries beyond capacity. Only optimal paths (or any DFS path)
+        are cached: the paths of weighted, anytime or fallback searches
+        depend on more than the method and board
+        """
+        if not stats["solvable"] or not (stats["optimal"] or method == "dfs"):
+            return
+        key, transposed = canonical_board(state.tiles, method not in ORDERED_METHODS)
+        path = stats["path"]
+        if transposed:
+            path = [TRANSPOSED_MOVES[move] for move in path]
+        letters = "".join(MOVE_LETTERS[MOVES.index(move)] for move in path)
+        self.db.execute("INSERT OR REPLACE INTO solutions VALUES (?, ?, ?, ?, ?, ?)",
+                        (method, state.dimensions, str(key), letters,
+                         stats["max_search_depth"], time.time()))
+        self.db.execute(
+            "DELETE FROM solutions WHERE rowid IN (SELECT rowid FROM solutions "
+            "ORDER BY used DESC LIMIT -1 OFFSET ?)", (self.capacity,))
+        self.db.commit()
+
+    def close(self):
+        self.db.close()
@@ -0,0 +1,150 @@
+import time
+import logging
+
+import numpy as np
+
+from npuzzle import (MOVES, move_code_table, move_offsets, pack_tiles, search_counters,
+                     tile_bits, undo_move)
+
+# Layers are arrays of packed keys, so boards have to fit in 64 bits
+MAX_TILES = 16
+
+
+def move_tables(dimensions):
+    """
+    For the moves in UDLR order, the offset each one adds to the blank's
+    index, and a (4, m^2) table of which blank positions allow it
+    """
+    offsets = np.array(move_offsets(dimensions), dtype=np.int64)
+    legal = np.zeros((4, dimensions * dimensions), dtype=bool)
+    for i, moves in enumerate(move_code_table(dimensions)):
+        for _, code in moves:
+            legal[code, i] = True
+    return offsets, legal
+
+
+def in_sorted(values, sorted_keys):
+    """
+    Boolean mask of which of values appear in the sorted array sorted_keys
+    """
+    if sorted_keys.size == 0:
+        return np.zeros(values.shape, dtype=bool)
+    index = np.searchsorted(sorted_keys, values)
+    index[index == sorted_keys.size] = 0
+    return sorted_keys[index] == values
+
+
+def expand_layer(keys, blanks, dimensions, offsets, legal):
+    """
+    Generates every child of every state in a layer at once: for each of
+    the four moves, the states whose blank allows it are selected by fancy
+    indexing and the moved tile is shifted across in their packed keys.
+    Returns the children's keys, blank positions and move codes
+    """
+    bits = np.uint64(tile_bits(dimensions))
+    mask = np.uint64((1 << tile_bits(dimensions)) - 1)
+    child_keys = []
+    child_blanks = []
+    child_moves = []
+    for code in range(4):
+        rows = legal[code][blanks]
+        parent_keys = keys[rows]
+        parent_blanks = blanks[rows].astype(np.int64)
+        new_blanks = parent_blanks + offsets[code]
+        new_shift = new_blanks.astype(np.uint64) * bits
+        old_shift = parent_blanks.astype(np.uint64) * bits
+        tile = (parent_keys >> new_shift) & mask
+        child_keys.append(parent_keys - (tile << new_shift) + (tile << old_shift))
+        child_blanks.append(new_blanks.astype(np.uint8))
+        child_moves.append(np.full(parent_keys.size, code, dtype=np.uint8))
+    return (np.concatenate(child_keys), np.concatenate(child_blanks),
+            np.concatenate(child_moves))
+
+
+def bfs_layers(tiles):
+    """
+    Breadth first search a layer at a time from the board tiles, yielding
+    (depth, keys, blanks, moves) for every layer: the sorted packed keys of
+    the states at that depth, their blank positions, and the code of the
+    move that first reached each of them (0 for the root).
+    The puzzle's graph is bipartite (every move flips the blank's colour on
+    a chequerboard), so the children of a layer are either new or in the
+    layer before it, and that's the only layer they're checked against
+    """
+    size = len(tiles)
+    if size > MAX_TILES:
+        raise ValueError("Layered BFS supports boards of up to %d tiles" % MAX_TILES)
+    dimensions = int(np.sqrt(size))
+    offsets, legal = move_tables(dimensions)
+
+    keys = np.array([pack_tiles(tiles, tile_bits(dimensions))], dtype=np.uint64)
+    blanks = np.array([tiles.index(0)], dtype=np.uint8)
+    moves = np.zeros(1, dtype=np.uint8)
+    previous = np.empty(0, dtype=np.uint64)
+    depth = 0
+    while keys.size:
+        yield depth, keys, blanks, moves
+        child_keys, child_blanks, child_moves = expand_layer(keys, blanks, dimensions,
+                                                             offsets, legal)
+        child_keys, first = np.unique(child_keys, return_index=True)
+        fresh = ~in_sorted(child_keys, previous)
+        previous = keys
+        keys = child_keys[fresh]
+        blanks = child_blanks[first][fresh]
+        moves = child_moves[first][fresh]
+        depth = depth + 1
+
+
+def solve_layered(initial_state):
+    """
+    Solves a board with the layered BFS, keeping every layer's keys and
+    move codes so the path can be recovered once the goal turns up.
+    Returns the same stats dict as NPuzzleSolver.solve(). nodes_expanded
+    counts every state of the layers before the goal's, which is a little
+    more than plain BFS, as that stops part way through the last layer
+    """
+    start_time = time.time()
+    dimensions = initial_state.dimensions
+    size = dimensions * dimensions
+    goal_key = pack_tiles(list(range(size)), tile_bits(dimensions))
+    legal = move_tables(dimensions)[1]
+
+    layers = []
+    nodes_expanded = 0
+    children = 0
+    pushes = 0
+    for depth, keys, blanks, moves in bfs_layers(initial_state.tiles):
+        layers.append((keys, moves))
+        if depth > 0:
+            pushes = pushes + keys.size
+        if in_sorted(np.array([goal_key], dtype=np.uint64), keys)[0]:
+            soln = recover_path(layers, goal_key, 0, dimensions)
+            stats = {}
+            stats["nodes_expanded"] = nodes_expanded
+            stats["search_depth"] = depth
+            stats["max_search_depth"] = depth
+            stats["cost_of_path"] = len(soln)
+            stats["time"] = time.time() - start_time
+            stats["path"] = soln
+            stats["counters"] = search_counters(nodes_expanded, nodes_expanded,
+                                                pushes, children - pushes, 0)
+            return stats
+        nodes_expanded = nodes_expanded + keys.size
+        children = children + int(legal[:, blanks].sum())
+        logging.debug("Layer %d: %d states", depth, keys.size)
+    logging.error("This is an unsolvable board!")
+    return None
+
+
+def recover_path(layers, key, empty_index, dimensions):
+    """
+    Walks back from the state with the given key in the last of layers to
+    the root, undoing the move recorded for each state on the packed key
+    """
+    moves = []
+    for keys, codes in reversed(layers[1:]):
+        code = int(codes[np.searchsorted(keys, np.uint64(key))])
+        moves.append(MOVES[code])
+        key, empty_index = undo_move(key, empty_index, code, dimensions)
+    moves.reverse()
+    return moves